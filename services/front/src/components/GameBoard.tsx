@@ -1,14 +1,18 @@
-import { For, Index, createSignal, onCleanup, createMemo, createEffect, batch, Component } from 'solid-js';
+import { For, Index, createSignal, onCleanup, onMount, createMemo, createEffect, batch, Component } from 'solid-js';
 import { KingIcon } from "./KingIcon";
 import { FieldIcon } from "./FieldIcon";
 import { CastleIcon } from "./CastleIcon";
 import { COLORS } from '../config';
 import type { Cell } from "../types/map";
 import { CellType } from "../types/map";
-import type { Player, Cursor, CursorMove } from "../types/room"
+import type { Player, Cursor, CursorMove, Viewport } from "../types/room"
 
 
 type Direction = 'up' | 'down' | 'left' | 'right';
+
+// w-8 cell plus border-spacing-1, and the table padding before the first cell
+const CELL_PITCH = 36;
+const BOARD_OFFSET = 20;
 type CellCoord = `${number},${number}`;
 
 const DirectionArrow: Component<{ direction: Direction }> = (props) => {
@@ -112,6 +116,7 @@ type GameBoardProps = {
   previousCursor: Cursor | undefined;
   onCellClick: (rowIndex: number, colIndex: number, cell: Cell) => void;
   onCursorMove: (move: CursorMove) => void;
+  onViewportChange?: (viewport: Viewport) => void;
 };
 
 export const GameBoard: Component<GameBoardProps> = (props) => {
@@ -284,6 +289,43 @@ export const GameBoard: Component<GameBoardProps> = (props) => {
     }
   });
 
+  let container: HTMLDivElement | undefined;
+  let lastViewport: Viewport | undefined;
+  let viewportFrame = 0;
+
+  // Tells the server which cells are on screen, it then streams only that part of the board
+  const reportViewport = () => {
+    viewportFrame = 0;
+    if (!container) return;
+    const viewport: Viewport = {
+      row: Math.floor(Math.max(container.scrollTop - BOARD_OFFSET, 0) / CELL_PITCH),
+      col: Math.floor(Math.max(container.scrollLeft - BOARD_OFFSET, 0) / CELL_PITCH),
+      height: Math.ceil(container.clientHeight / CELL_PITCH) + 1,
+      width: Math.ceil(container.clientWidth / CELL_PITCH) + 1,
+    };
+    if (
+      lastViewport?.row === viewport.row && lastViewport?.col === viewport.col &&
+      lastViewport?.height === viewport.height && lastViewport?.width === viewport.width
+    ) return;
+    lastViewport = viewport;
+    props.onViewportChange?.(viewport);
+  };
+
+  const scheduleViewport = () => {
+    if (!viewportFrame) {
+      viewportFrame = requestAnimationFrame(reportViewport);
+    }
+  };
+
+  onMount(() => {
+    reportViewport();
+    window.addEventListener('resize', scheduleViewport);
+    onCleanup(() => {
+      window.removeEventListener('resize', scheduleViewport);
+      cancelAnimationFrame(viewportFrame);
+    });
+  });
+
   const tableClass = createMemo(() => 
     `border-separate border-spacing-1 bg-white/60 backdrop-blur-sm p-4 
     rounded-2xl shadow-xl border border-white/10`
@@ -297,8 +339,12 @@ export const GameBoard: Component<GameBoardProps> = (props) => {
 
   return (
     <div class="p-4 w-full" tabIndex={0}>
-      <div class="flex justify-center">
-        <table class={tableClass()}>
+      <div
+        ref={container}
+        class="max-w-full max-h-[75vh] overflow-auto"
+        onScroll={scheduleViewport}
+      >
+        <table class={`${tableClass()} mx-auto`}>
           <tbody>
             <Index each={props.data}>
               {(row, rowIndex) => (
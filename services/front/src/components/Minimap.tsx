@@ -0,0 +1,60 @@
+import { Component, createEffect, createMemo } from 'solid-js';
+import { COLORS } from '../config';
+import type { Minimap as MinimapData } from "../types/map";
+import type { Player, Viewport } from "../types/room";
+
+const BLOCK_PIXELS = 6;
+
+type MinimapProps = {
+  minimap: MinimapData;
+  rows: number;
+  cols: number;
+  players: Player[];
+  viewport: Viewport | undefined;
+};
+
+// Coarse overview of the board: dominant owner per block and the rendered viewport frame
+export const Minimap: Component<MinimapProps> = (props) => {
+  let canvas: HTMLCanvasElement | undefined;
+
+  const playerColors = createMemo(() =>
+    new Map(props.players.map(p => [p.id, COLORS[p.color]]))
+  );
+
+  const scale = createMemo(() => BLOCK_PIXELS / props.minimap.block);
+
+  createEffect(() => {
+    const context = canvas?.getContext('2d');
+    if (!canvas || !context) return;
+
+    const block = props.minimap.block;
+    canvas.width = Math.ceil(props.cols / block) * BLOCK_PIXELS;
+    canvas.height = Math.ceil(props.rows / block) * BLOCK_PIXELS;
+    context.fillStyle = '#f4f4f5';
+    context.fillRect(0, 0, canvas.width, canvas.height);
+
+    for (const [row, col, player] of props.minimap.cells) {
+      context.fillStyle = playerColors().get(player) ?? '#d4d4d8';
+      context.fillRect(col * BLOCK_PIXELS, row * BLOCK_PIXELS, BLOCK_PIXELS, BLOCK_PIXELS);
+    }
+
+    const viewport = props.viewport;
+    if (viewport) {
+      context.strokeStyle = '#18181b';
+      context.lineWidth = 1;
+      context.strokeRect(
+        viewport.col * scale() + 0.5,
+        viewport.row * scale() + 0.5,
+        viewport.width * scale() - 1,
+        viewport.height * scale() - 1,
+      );
+    }
+  });
+
+  return (
+    <canvas
+      ref={canvas}
+      class="rounded-lg shadow-md border border-white/10 bg-white/60"
+    />
+  );
+};
@@ -1,7 +1,8 @@
-import { createResource, For } from "solid-js";
+import { createResource, For, onCleanup, onMount } from "solid-js";
 import { useNavigate } from "@solidjs/router";
 import api from "../api/axios";
-import type { LobbyRoom } from "../types/room";
+import { BASE_WS_URL } from "../config";
+import type { LobbyEvent, LobbyRoom } from "../types/room";
 
 const fetchRoomsList = async (): Promise<LobbyRoom[]> => {
   try {
@@ -13,10 +14,59 @@ const fetchRoomsList = async (): Promise<LobbyRoom[]> => {
   }
 };
 
+const applyLobbyEvent = (rooms: LobbyRoom[], event: LobbyEvent): LobbyRoom[] => {
+  switch (event.at) {
+    case "snapshot":
+      return event.rooms;
+    case "room":
+      return [event.room, ...rooms.filter((room) => room.name !== event.room.name)];
+    case "players":
+      return rooms.map((room) =>
+        room.name === event.name ? { ...room, current_players: event.current_players } : room
+      );
+    case "remove":
+      return rooms.filter((room) => room.name !== event.name);
+  }
+};
+
+// Reconnect delay doubles after every failed attempt, up to the maximum
+const LOBBY_RECONNECT_DELAY = 1000;
+const LOBBY_RECONNECT_MAX_DELAY = 30000;
+
 export const RoomsList = () => {
-  const [rooms, { refetch }] = createResource<LobbyRoom[]>(fetchRoomsList);
+  const [rooms, { refetch, mutate }] = createResource<LobbyRoom[]>(fetchRoomsList);
   const navigate = useNavigate();
 
+  onMount(() => {
+    let ws: WebSocket | undefined;
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+    let reconnectDelay = LOBBY_RECONNECT_DELAY;
+    let closed = false;
+
+    // Every connection starts with a snapshot, so nothing is lost while reconnecting
+    const connect = () => {
+      ws = new WebSocket(`${BASE_WS_URL}/ws/lobby/`);
+      ws.onmessage = (event) => {
+        reconnectDelay = LOBBY_RECONNECT_DELAY;
+        const lobbyEvent = JSON.parse(event.data) as LobbyEvent;
+        mutate((current) => applyLobbyEvent(current ?? [], lobbyEvent));
+      };
+      ws.onclose = () => {
+        if (closed) return;
+        const jitter = Math.random() * reconnectDelay * 0.2;
+        reconnectTimer = setTimeout(connect, reconnectDelay + jitter);
+        reconnectDelay = Math.min(reconnectDelay * 2, LOBBY_RECONNECT_MAX_DELAY);
+      };
+    };
+
+    connect();
+    onCleanup(() => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      ws?.close();
+    });
+  });
+
   return (
     <div class="p-4 max-w-4xl mx-auto">
       <div class="flex justify-between items-center mb-6">
@@ -1,4 +1,4 @@
-import { useParams } from "@solidjs/router";
+import { useParams, useSearchParams } from "@solidjs/router";
 import { createSignal, createEffect, onCleanup, batch } from "solid-js";
 import { authActions } from "../stores/authStore";
 import { userStore } from "../stores/userStore";
@@ -11,20 +11,43 @@ import { LoadingSpinner } from "../components/LoadingSpinner";
 import { GameBoard } from "../components/GameBoard";
 import { GameStats } from "../components/GameStats";
 import { TutorialPopup } from "../components/TutorialPopup";
-import type { Player, CursorMove, Cursor } from "../types/room";
+import { Minimap } from "../components/Minimap";
+import type { Player, CursorMove, Cursor, Viewport } from "../types/room";
 import type { PlayerData, GameStat } from "../types/map";
-import type { Cell, GameMap } from "../types/map";
+import type { Cell, GameMap, Minimap as MinimapData } from "../types/map";
 import {
   PlayersMessage,
   AuthMessage,
   ChatMessage,
+  ChatBatchMessage,
   ReadyMessage,
   UpdateMessage,
+  ViewportMessage,
+  WatchMessage,
 } from "../types/messages";
+import api from "../api/axios";
 import { BASE_WS_URL } from "../config";
+import type { RoomReplica } from "../types/room";
 
 type Status = "connecting" | "config" | "active" | "error";
 
+const WRONG_REPLICA_REASON = "Wrong replica: ";
+// Closed by the room when the game has already started, the page falls back to watching it
+const GAME_STARTED_CLOSE_CODE = 4020;
+// Abnormal closure, server error and restart: the replica running the game went away
+const RECOVERABLE_CLOSE_CODES = [1006, 1011, 1012];
+
+// Replica owning the room; sent as the replica query param so the proxy routes straight to it
+const lookupReplica = async (roomId: string): Promise<string | null> => {
+  try {
+    const response = await api.get<RoomReplica>(`/api/v1/rooms/${roomId}/replica/`);
+    return response.data.replica;
+  } catch (error) {
+    console.error("Error looking up room replica:", error);
+    return null;
+  }
+};
+
 const getWebSocketErrorMessage = (code: number): string => {
   switch (code) {
     case 4010:
@@ -44,6 +67,18 @@ const getWebSocketErrorMessage = (code: number): string => {
   }
 };
 
+// Windowed frames carry only the declared viewport, the rest of the board keeps its last state
+const mergeWindow = (board: GameMap | undefined, slice: GameMap, offset?: Cursor): GameMap => {
+  if (!offset || !board) return slice;
+  const next = [...board];
+  slice.forEach((line, index) => {
+    const row = [...next[offset.row + index]];
+    row.splice(offset.col, line.length, ...line);
+    next[offset.row + index] = row;
+  });
+  return next;
+};
+
 type ChatLine = {
   id: number;
   userId: number;
@@ -64,6 +99,7 @@ function makeMessage(text: string): ChatMessage {
 
 export default function Room() {
   const params = useParams();
+  const [searchParams, setSearchParams] = useSearchParams();
   const [status, setStatus] = createSignal<Status>("connecting");
   const [players, setPlayers] = createSignal<Player[]>([]);
   const [data, setData] = createSignal<GameMap | undefined>(undefined);
@@ -74,12 +110,18 @@ export default function Room() {
   const [stats, setStats] = createSignal<[PlayerData, GameStat][]>([]);
   const [currentCursor, setCurrentCursor] = createSignal<Cursor | undefined>();
   const [previousCursor, setPreviousCursor] = createSignal<Cursor | undefined>();
+  const [viewport, setViewport] = createSignal<Viewport | undefined>();
+  const [minimap, setMinimap] = createSignal<MinimapData | undefined>();
   const [errorMessage, setErrorMessage] = createSignal("Что-то пошло не так");
+  const [watching, setWatching] = createSignal(searchParams.watch !== undefined);
   const [showTutorial, setShowTutorial] = createSignal(!localStorage.getItem('kingdomsTutorialSeen'));
 
   let reconnectAttempts = 0;
+  let replicaHint: string | null = null;
+  let gameStarted = false;
   const MAX_RECONNECT_ATTEMPTS = 10;
   const RECONNECT_DELAY = 0;
+  const RECOVERY_DELAY = 3000;
 
   const handleColorSelect = (colorIndex: number) => {
     socket()?.send(
@@ -93,12 +135,19 @@ export default function Room() {
   const connectWebSocket = () => {
     if (userStore.user.username === "") return;
 
-    const getParams = new URLSearchParams({
-      user_id: userStore.user.user_id.toString(),
-      username: userStore.user.username,
-    });
+    // Spectators take no slot, after auth they only receive watch frames
+    const getParams = watching()
+      ? new URLSearchParams()
+      : new URLSearchParams({
+          user_id: userStore.user.user_id.toString(),
+          username: userStore.user.username,
+        });
+    if (replicaHint) {
+      getParams.set("replica", replicaHint);
+    }
+    const path = watching() ? "watch/" : "";
     const ws = new WebSocket(
-      `${BASE_WS_URL}/ws/rooms/${params.roomId}/?${getParams.toString()}`
+      `${BASE_WS_URL}/ws/rooms/${params.roomId}/${path}?${getParams.toString()}`
     );
 
     ws.onopen = () => {
@@ -116,7 +165,12 @@ export default function Room() {
       const data = JSON.parse(event.data);
 
       if (data.at === "auth") {
-        setStatus("config");
+        // The room sends its recent chat history after every (re)connect
+        setMessages([]);
+        // Spectators stay on the spinner until the first watch frame
+        if (!watching()) {
+          setStatus("config");
+        }
       }
 
       if (data.at === "players") {
@@ -128,31 +182,55 @@ export default function Room() {
       }
 
       if (data.at === "start") {
+        gameStarted = true;
         setStatus("active");
       }
 
       if (data.at === "update") {
         const updateMessage = data as UpdateMessage;
         batch(() => {
-          setData(updateMessage.map);          
+          setData((board) => mergeWindow(board, updateMessage.map, updateMessage.window));
+          if (updateMessage.minimap) {
+            setMinimap(updateMessage.minimap);
+          }
           setTurn(updateMessage.turn);         
           setStats([updateMessage.stat]);      
           setCurrentCursor(updateMessage.cursor);
           setPreviousCursor(updateMessage.prev_cursor);
         });
+        // A full frame after a reconnect: the new connection has no viewport yet
+        if (!updateMessage.window && viewport()) {
+          sendViewport(viewport()!);
+        }
+      }
+
+      if (data.at === "watch") {
+        const watchMessage = data as WatchMessage;
+        batch(() => {
+          setData(watchMessage.map);
+          setMinimap(undefined);
+          setTurn(watchMessage.turn);
+          setStats(watchMessage.stats);
+          setCurrentCursor(undefined);
+          setPreviousCursor(undefined);
+          if (watching()) {
+            setPlayers(watchMessage.stats.map(([player]) => player));
+            setStatus("active");
+          }
+        });
       }
 
-      if (data.at === "chat") {
-        const chatMessage = data as ChatMessage;
+      if (data.at === "chats") {
+        const chatBatch = data as ChatBatchMessage;
         setMessages((messages) => [
           ...messages,
-          {
-            id: messages.length,
+          ...chatBatch.messages.map((chatMessage, index) => ({
+            id: messages.length + index,
             userId: chatMessage.user_id,
             username: chatMessage.username,
             text: chatMessage.message,
-            timestamp: new Date(data.timestamp).toLocaleDateString(),
-          },
+            timestamp: new Date(chatMessage.timestamp).toLocaleDateString(),
+          })),
         ]);
       }
     };
@@ -164,14 +242,36 @@ export default function Room() {
     };
 
     ws.onclose = (event) => {
-      if (event.code === 1008) {
+      if (event.code === GAME_STARTED_CLOSE_CODE && !watching()) {
+        setWatching(true);
+        setSearchParams({ watch: "1" });
+        setTimeout(connectWebSocket, RECONNECT_DELAY);
+        return;
+      }
+      // The watch feed closes normally once the game is over, the last board stays on screen
+      if (event.code === 1000 && watching() && status() === "active") {
+        return;
+      }
+      const replicaLost = RECOVERABLE_CLOSE_CODES.includes(event.code) && gameStarted;
+      if (event.code === 1008 || replicaLost) {
+        if (event.reason.startsWith(WRONG_REPLICA_REASON)) {
+          replicaHint = event.reason.slice(WRONG_REPLICA_REASON.length);
+        }
         if (reconnectAttempts < MAX_RECONNECT_ATTEMPTS) {
           console.log(
             `Попытка переподключения ${reconnectAttempts + 1} из ${MAX_RECONNECT_ATTEMPTS}`
           );
           setStatus("connecting");
           reconnectAttempts++;
-          setTimeout(connectWebSocket, RECONNECT_DELAY);
+          if (replicaLost) {
+            // The game resumes from its snapshot on whichever replica claims it next
+            setTimeout(async () => {
+              replicaHint = await lookupReplica(params.roomId);
+              connectWebSocket();
+            }, RECOVERY_DELAY);
+          } else {
+            setTimeout(connectWebSocket, RECONNECT_DELAY);
+          }
         } else {
           console.log("Достигнуто максимальное количество попыток");
           setStatus("error");
@@ -187,9 +287,19 @@ export default function Room() {
   };
 
   createEffect(() => {
-    const ws = connectWebSocket();
+    if (userStore.user.username === "") return;
+
+    let ws: WebSocket | undefined;
+    let cancelled = false;
+    lookupReplica(params.roomId).then((replica) => {
+      replicaHint = replica;
+      if (!cancelled) {
+        ws = connectWebSocket();
+      }
+    });
 
     onCleanup(() => {
+      cancelled = true;
       if (ws) {
         ws.close();
       }
@@ -206,6 +316,16 @@ export default function Room() {
     );
   };
 
+  const sendViewport = (rect: Viewport) => {
+    const viewportMessage: ViewportMessage = { at: "viewport", ...rect };
+    socket()?.send(JSON.stringify(viewportMessage));
+  };
+
+  const handleViewportChange = (rect: Viewport) => {
+    setViewport(rect);
+    sendViewport(rect);
+  };
+
   const handleSendMessage = (text: string) => {
     socket()?.send(JSON.stringify(makeMessage(text)));
   };
@@ -236,7 +356,7 @@ export default function Room() {
 
   return (
     <div class="container mx-auto p-4 flex flex-col items-center">
-      {status() !== "connecting" && status() !== "error" && (
+      {status() !== "connecting" && status() !== "error" && !watching() && (
         <Chat messages={messages()} onSendMessage={handleSendMessage} />
       )}
 
@@ -263,6 +383,15 @@ export default function Room() {
       {status() === "active" && data() !== undefined && (
         <div class="flex flex-col items-center gap-8">
           <GameStats turn={turn()} stats={stats()} />
+          {minimap() !== undefined && (
+            <Minimap
+              minimap={minimap()!}
+              rows={data()!.length}
+              cols={data()![0]?.length ?? 0}
+              players={players()}
+              viewport={viewport()}
+            />
+          )}
           <GameBoard
             data={data()}
             players={players()}
@@ -271,6 +400,7 @@ export default function Room() {
             previousCursor={previousCursor()}
             onCellClick={handleCellClick}
             onCursorMove={handleCursorMove}
+            onViewportChange={handleViewportChange}
           />
         </div>
       )}
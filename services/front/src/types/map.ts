@@ -17,6 +17,12 @@ export type GameMap = Cell[][];
 
 export type Point = [number, number];
 
+// Dominant owner of every known block of `block` x `block` cells: [row, col, player]
+export type Minimap = {
+  block: number;
+  cells: [number, number, number][];
+};
+
 export interface MapMeta {
   points_of_interest: { [key in CellType]: Point[] };
 }
@@ -1,5 +1,5 @@
 import type { Player, Cursor } from "../types/room"
-import type { GameMap, GameStat, PlayerData } from "../types/map"
+import type { GameMap, GameStat, Minimap, PlayerData } from "../types/map"
 
 export type PlayersMessage = {
     at: "players";
@@ -23,6 +23,12 @@ export type ChatMessage = {
   timestamp: string;
 };
 
+// Chat messages of a short window, or the recent history on join
+export type ChatBatchMessage = {
+  at: "chats";
+  messages: ChatMessage[];
+};
+
 export type UpdateMessage = {
   at: 'update';
   map: GameMap;
@@ -30,4 +36,24 @@ export type UpdateMessage = {
   cursor: Cursor;
   prev_cursor: Cursor;
   stat: [PlayerData, GameStat];
+  // Set once a viewport is declared: map is then only the slice starting at this offset
+  window?: Cursor;
+  minimap?: Minimap;
+}
+
+// Rectangle of the board the client renders, in cells
+export type ViewportMessage = {
+  at: 'viewport';
+  row: number;
+  col: number;
+  height: number;
+  width: number;
+}
+
+// Whole board and every player's stats, sent to spectators and eliminated players
+export type WatchMessage = {
+  at: 'watch';
+  map: GameMap;
+  turn: number;
+  stats: [PlayerData, GameStat][];
 }
\ No newline at end of file
@@ -11,6 +11,17 @@ export type LobbyRoom = {
     current_players: number;
 };
 
+export type RoomReplica = {
+    room_key: string;
+    replica: string | null;
+};
+
+export type LobbyEvent =
+    | { at: "snapshot"; rooms: LobbyRoom[] }
+    | { at: "room"; room: LobbyRoom }
+    | { at: "players"; name: string; current_players: number }
+    | { at: "remove"; name: string };
+
 
 export type Cursor = {
     row: number;
@@ -20,4 +31,12 @@ export type Cursor = {
 export type CursorMove = {
     previous?: Cursor;
     current?: Cursor;
-};
\ No newline at end of file
+};
+
+// Rectangle of the board visible on screen, in cells
+export type Viewport = {
+    row: number;
+    col: number;
+    height: number;
+    width: number;
+};
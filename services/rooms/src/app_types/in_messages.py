@@ -24,3 +24,11 @@ class MoveMessage(TypedDict):
 class ColorMessage(TypedDict):
     at: Literal["color"]
     color: int
+
+
+class ViewportMessage(TypedDict):
+    at: Literal["viewport"]
+    row: int
+    col: int
+    height: int
+    width: int
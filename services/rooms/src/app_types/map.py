@@ -21,6 +21,13 @@ class Point(NamedTuple):
     col: int
 
 
+class Viewport(NamedTuple):
+    row: int
+    col: int
+    height: int
+    width: int
+
+
 class MapMeta(TypedDict):
     points_of_interest: dict[CellType, list[Point]]
     version: Literal[1]
@@ -5,6 +5,7 @@ from app_types.in_messages import (
     ColorMessage,
     MoveMessage,
     ReadyMessage,
+    ViewportMessage,
 )
 from app_types.out_messages import AuthConfirmMessage, PlayersMessage, StartMessage, UpdateMessage
 
@@ -17,7 +18,12 @@ class ChatMessage(TypedDict):
     timestamp: str
 
 
-InMessage = AuthMessage | ReadyMessage | MoveMessage | ColorMessage | ChatMessage
+class ChatBatchMessage(TypedDict):
+    at: Literal["chats"]
+    messages: list[ChatMessage]
 
 
-OutMessage = PlayersMessage | AuthConfirmMessage | StartMessage | UpdateMessage | ChatMessage
+InMessage = AuthMessage | ReadyMessage | MoveMessage | ColorMessage | ViewportMessage | ChatMessage
+
+
+OutMessage = PlayersMessage | AuthConfirmMessage | StartMessage | UpdateMessage | ChatBatchMessage
@@ -35,6 +35,11 @@ class GameStat(TypedDict):
     power: int
 
 
+class MinimapDict(TypedDict):
+    block: int
+    cells: list[tuple[int, int, int]]
+
+
 class UpdateMessage(TypedDict):
     at: Literal["update"]
     map: GameMap
@@ -42,3 +47,19 @@ class UpdateMessage(TypedDict):
     stat: tuple[PlayerData, GameStat]
     cursor: NotRequired[PointDict]
     prev_cursor: NotRequired[PointDict]
+    window: NotRequired[PointDict]
+    minimap: NotRequired[MinimapDict]
+
+
+class WatchMessage(TypedDict):
+    at: Literal["watch"]
+    map: GameMap
+    turn: int
+    stats: list[tuple[PlayerData, GameStat]]
+
+
+class ReplayMessage(TypedDict):
+    at: Literal["replay"]
+    map: GameMap
+    turn: int
+    stats: list[tuple[PlayerData, GameStat]]
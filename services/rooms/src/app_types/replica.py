@@ -0,0 +1,23 @@
+from enum import IntEnum
+from typing import TypedDict
+
+
+class ReplicaLoad(TypedDict):
+    rooms: int
+    players: int
+    lag: float
+    cpu: float
+
+
+class ProfileCapture(TypedDict):
+    started: float
+    seconds: float
+    reason: str
+    samples: int
+    folded: str
+
+
+class LoadLevel(IntEnum):
+    NORMAL = 0
+    DEGRADED = 1
+    SHEDDING = 2
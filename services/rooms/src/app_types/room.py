@@ -1,7 +1,68 @@
-from typing import TypedDict
+from typing import Literal, NamedTuple, TypedDict
+
+from app_types.common import PlayerStatus
+from app_types.map import GameMap, MapMeta, Point
 
 
 class LobbyRoom(TypedDict):
     name: str
     max_players: int
     current_players: int
+
+
+class RoomClaim(NamedTuple):
+    replica: str
+    raw_room: bytes | None
+    listed: bool
+
+
+class SnapshotPlayer(TypedDict):
+    id: int
+    nick: str
+    color: int
+    status: PlayerStatus
+    init_point: Point
+
+
+class RoomSnapshot(TypedDict):
+    turn: int
+    players: list[SnapshotPlayer]
+    map: GameMap
+    meta: MapMeta
+
+
+class LobbyPage(TypedDict):
+    rooms: list[LobbyRoom]
+    next_cursor: str | None
+
+
+class LobbyRoomEvent(TypedDict):
+    at: Literal["room"]
+    room: LobbyRoom
+
+
+class LobbyPlayersEvent(TypedDict):
+    at: Literal["players"]
+    name: str
+    current_players: int
+
+
+class LobbyRemoveEvent(TypedDict):
+    at: Literal["remove"]
+    name: str
+
+
+class LobbySnapshotEvent(TypedDict):
+    at: Literal["snapshot"]
+    rooms: list[LobbyRoom]
+
+
+LobbyEvent = LobbyRoomEvent | LobbyPlayersEvent | LobbyRemoveEvent | LobbySnapshotEvent
+
+
+class GameEvent(TypedDict):
+    """Entry of a room's event stream, data is JSON whose shape depends on the type"""
+
+    type: Literal["captures", "eliminated", "turn", "finished"]
+    turn: int
+    data: bytes
@@ -0,0 +1,25 @@
+import hmac
+from typing import Annotated
+
+from fastapi import Header, HTTPException
+
+from settings import settings
+
+not_access = HTTPException(
+    status_code=401,
+    detail="Invalid debug token",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+async def verify_debug_token(
+    authorization: Annotated[str | None, Header()] = None,
+) -> None:
+    """Let through requests bearing the debug token, nothing passes while it is not set"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if (
+        not settings.debug_token
+        or scheme.lower() != "bearer"
+        or not hmac.compare_digest(token, settings.debug_token)
+    ):
+        raise not_access
@@ -0,0 +1,6 @@
+class ReplicaError(Exception):
+    """Base exception for replica-level errors"""
+
+
+class ProfilerBusy(ReplicaError):
+    """Another profile is being captured"""
@@ -24,3 +24,11 @@ class RoomNoSlots(RoomError):
 
 class RoomWrongReplica(RoomError):
     """Wrong replica id"""
+
+    def __init__(self, replica: str):
+        super().__init__(f"Room is owned by replica {replica}")
+        self.replica = replica
+
+
+class RoomPlayerLeft(RoomError):
+    """Player left the room before the game started"""
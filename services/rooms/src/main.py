@@ -8,8 +8,13 @@ from prometheus_client import make_asgi_app
 from sentry_sdk.integrations.logging import LoggingIntegration
 
 from logger import logging
+from repositories.replica import replica_repo
 from router.api import api_router
+from router.debug import debug_router
 from router.ws import ws_router
+from services.lobby import lobby_feed
+from services.loop_monitor import loop_monitor
+from services.replica import replica_drain, replica_monitor
 from settings import settings
 from stores.redis import redis_manager
 
@@ -34,7 +39,17 @@ if settings.sentry_dsn:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    lobby_feed.start()
+    loop_monitor.start()
+    replica_monitor.start()
+    replica_drain.install()
     yield
+    await replica_monitor.stop()
+    await loop_monitor.stop()
+    async with redis_manager.client() as redis:
+        # Rooms left on this replica can be claimed elsewhere without waiting for the lease
+        await replica_repo.withdraw(redis, release_lease=True)
+    await lobby_feed.stop()
     await redis_manager.close()
 
 
@@ -42,6 +57,7 @@ app = FastAPI(
     default_response_class=ORJSONResponse,
     docs_url="/api/rooms/docs/",
     openapi_url="/api/rooms/openapi.json",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -50,9 +66,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
 app.include_router(ws_router)
 app.include_router(api_router)
+app.include_router(debug_router)
 app.mount("/metrics", make_asgi_app())
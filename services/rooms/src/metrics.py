@@ -1,12 +1,19 @@
-from prometheus_client import Gauge, Histogram, Summary
+from prometheus_client import Counter, Gauge, Histogram, Summary
 
 TURN_DURATION = Histogram(
     "game_turn_duration_seconds", "Time spent processing game turn", ["operation"]
 )
+# Children bound once, turns observe them without a label lookup
+TURN_DURATION_BY_OPERATION = {
+    operation: TURN_DURATION.labels(operation=operation)
+    for operation in ("update_map", "process_moves", "update_hold", "update_pov", "finish_turn")
+}
 
-GAME_STATE = Gauge(
-    "game_state", "Current game state (0-waiting, 1-in_progress, 2-finished)", ["room_id"]
-)
+# Per-state totals of this replica, computed on scrape, see RoomManager. Per-room detail
+# lives at /debug/rooms to keep the series count independent of the number of rooms.
+ROOMS = Gauge("game_rooms", "Rooms on this replica by game state", ["state"])
+PLAYERS = Gauge("game_players", "Players connected to this replica by game state", ["state"])
+SPECTATORS = Gauge("game_spectators", "Spectators watching rooms of this replica")
 
 
 WS_MESSAGE_SIZE = Histogram(
@@ -15,7 +22,24 @@ WS_MESSAGE_SIZE = Histogram(
     ["direction", "message_type"],  # in/out, update/move/chat
     buckets=[64, 128, 256, 512, 1024, 2048, 4096],
 )
+WS_OUT_MESSAGE_SIZE = {
+    message_type: WS_MESSAGE_SIZE.labels(direction="out", message_type=message_type)
+    for message_type in ("auth", "players", "start", "update")
+}
+
+# Accepted or over the rate limit of the user, see ChatChannel
+CHAT_MESSAGES_TOTAL = Counter("chat_messages_total", "Chat messages posted", ["result"])
+CHAT_MESSAGES = {
+    result: CHAT_MESSAGES_TOTAL.labels(result=result) for result in ("accepted", "limited")
+}
 
+# Game events that never reached the room's stream, see GameEvents
+GAME_EVENTS_DROPPED_TOTAL = Counter(
+    "game_events_dropped_total", "Game events dropped before publishing", ["reason"]
+)
+GAME_EVENTS_DROPPED = {
+    reason: GAME_EVENTS_DROPPED_TOTAL.labels(reason=reason) for reason in ("overflow", "failed")
+}
 
 GAME_DURATION = Summary("game_duration_turns_total", "Number of turns the game lasted")
 
@@ -25,3 +49,23 @@ TERRITORY_SIZE = Histogram(
     "Number of cells controlled by players at game end",
     buckets=[1, 5, 10, 25, 50, 100, 200, 500, 1000],
 )
+
+# Map template cache metrics
+MAP_TEMPLATE_CACHE = Counter(
+    "map_template_cache_lookups_total", "Map template cache lookups", ["result"]
+)  # hit/miss
+
+MAP_TEMPLATE_CACHE_SIZE = Gauge(
+    "map_template_cache_size_bytes", "Estimated in-memory size of cached map templates"
+)
+
+# Event loop load, see LoopMonitor
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of event loop timers past their deadline",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+LOAD_LEVEL = Gauge("replica_load_level", "Load shedding level, 0 normal, 1 degraded, 2 shedding")
+SHED_UPDATES = Counter(
+    "shed_updates_total", "Frames skipped for eliminated players and spectators under load"
+)
@@ -0,0 +1,54 @@
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app_types.room import GameEvent
+from exceptions.room import RoomError
+from settings import settings
+
+
+class GameEventRepo:
+    """Repository class for the event streams of games.
+
+    Every room has a capped stream of its events, finished results of all rooms also go
+    to one shared stream. Consumers read them with XREAD from any host.
+    """
+
+    def __init__(self) -> None:
+        self._events_prefix: str = "__events:rooms:"
+        self.results_key: str = "__events:results"
+
+    def _make_key(self, room_key: str) -> str:
+        return f"{self._events_prefix}{room_key}"
+
+    async def publish(self, redis: Redis, room_key: str, events: list[GameEvent]) -> None:
+        """Append events to the room's stream, trimmed to about the newest ones
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room identifier
+            events: Events in the order they happened
+
+        Raises:
+            RoomError: If publishing fails
+        """
+        key = self._make_key(room_key)
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for event in events:
+                    await pipe.xadd(
+                        key, event, maxlen=settings.event_stream_maxlen, approximate=True
+                    )
+                    if event["type"] == "finished":
+                        await pipe.xadd(
+                            self.results_key,
+                            {"room_key": room_key, **event},
+                            maxlen=settings.event_results_maxlen,
+                            approximate=True,
+                        )
+                await pipe.expire(key, settings.room_ttl)
+                await pipe.execute()
+        except RedisError as e:
+            raise RoomError(f"Failed to publish game events: {e}") from e
+
+
+event_repo = GameEventRepo()
@@ -0,0 +1,60 @@
+from redis.asyncio import Redis
+from redis.client import NEVER_DECODE
+from redis.exceptions import RedisError
+
+from exceptions.room import RoomError, RoomNotFoundError
+from settings import settings
+
+
+class ReplayRepo:
+    """Repository class for recorded games"""
+
+    def __init__(self) -> None:
+        self._replay_prefix: str = "__replays:rooms:"
+
+    def _make_key(self, room_key: str) -> str:
+        return f"{self._replay_prefix}{room_key}"
+
+    async def save_replay(self, redis: Redis, room_key: str, replay: bytes) -> None:
+        """Save the replay of a finished game
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room identifier
+            replay: Encoded replay, see ReplayRecorder.dump
+
+        Raises:
+            RoomError: If saving fails
+        """
+        try:
+            await redis.setex(self._make_key(room_key), settings.replay_ttl, replay)
+        except RedisError as e:
+            raise RoomError(f"Failed to save replay: {e}") from e
+
+    async def load_replay(self, redis: Redis, room_key: str) -> bytes:
+        """Load the replay of a finished game
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room identifier
+
+        Returns:
+            bytes: Encoded replay
+
+        Raises:
+            RoomNotFoundError: If there is no replay of the room
+            RoomError: If Redis operation fails
+        """
+        try:
+            replay: bytes | None = await redis.execute_command(
+                "GET", self._make_key(room_key), **{NEVER_DECODE: []}
+            )
+        except RedisError as e:
+            raise RoomError(f"Redis error while loading replay: {e}") from e
+
+        if not replay:
+            raise RoomNotFoundError(f"Replay of room {room_key} not found")
+        return replay
+
+
+replay_repo = ReplayRepo()
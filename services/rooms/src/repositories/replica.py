@@ -0,0 +1,144 @@
+import time
+
+import orjson
+from redis.asyncio import Redis
+
+from app_types.replica import ReplicaLoad
+from settings import settings
+from stores.redis import redis_manager
+
+# Load score units: one player. CPU is the process share of one core, lag is in seconds.
+ROOM_WEIGHT = 2
+CPU_WEIGHT = 50
+LAG_WEIGHT = 500
+# Added to the picked replica's score so rooms created between heartbeats spread out
+PLACEMENT_COST = ROOM_WEIGHT
+
+_PICK_REPLICA_SCRIPT = redis_manager.register_script(
+    """
+    local best, best_score = false, nil
+    for _, replica in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], '+inf')) do
+        local score = tonumber(redis.call('ZSCORE', KEYS[2], replica))
+        if score and (not best_score or score < best_score) then
+            best, best_score = replica, score
+        end
+    end
+    if best then
+        redis.call('ZINCRBY', KEYS[2], ARGV[2], best)
+    end
+    return best
+    """
+)
+
+
+def load_score(load: ReplicaLoad) -> float:
+    return (
+        load["players"]
+        + ROOM_WEIGHT * load["rooms"]
+        + CPU_WEIGHT * load["cpu"]
+        + LAG_WEIGHT * load["lag"]
+    )
+
+
+class ReplicaRepo:
+    """Live replicas and their load, refreshed by heartbeats"""
+
+    def __init__(self) -> None:
+        self._alive_key = "__replicas:alive"
+        self._score_key = "__replicas:score"
+        self._load_key = "__replicas:load"
+        self._sweeper_key = "__replicas:sweeper"
+        self.lease_prefix = "__replicas:lease:"
+
+    async def heartbeat(self, redis: Redis, load: ReplicaLoad, placeable: bool = True) -> None:
+        """Publish this replica's load and renew its lease
+
+        Rooms owned by a replica whose lease expired can be claimed by any other replica.
+
+        Args:
+            redis: Redis connection instance
+            load: Current load of the replica
+            placeable: Whether new rooms may be placed on this replica
+        """
+        async with redis.pipeline(transaction=True) as pipe:
+            await pipe.set(
+                f"{self.lease_prefix}{settings.replica_id}",
+                1,
+                px=int(settings.heartbeat_timeout * 1000),
+            )
+            if placeable:
+                await pipe.zadd(self._alive_key, {settings.replica_id: time.time()})
+                await pipe.zadd(self._score_key, {settings.replica_id: load_score(load)})
+            else:
+                await pipe.zrem(self._alive_key, settings.replica_id)
+                await pipe.zrem(self._score_key, settings.replica_id)
+            await pipe.hset(self._load_key, settings.replica_id, orjson.dumps(load))
+            await pipe.execute()
+
+    async def withdraw(self, redis: Redis, release_lease: bool = False) -> None:
+        """Stop placements on this replica
+
+        Args:
+            redis: Redis connection instance
+            release_lease: Also drop the lease so other replicas can take its rooms now
+        """
+        async with redis.pipeline(transaction=True) as pipe:
+            await pipe.zrem(self._alive_key, settings.replica_id)
+            await pipe.zrem(self._score_key, settings.replica_id)
+            await pipe.hdel(self._load_key, settings.replica_id)
+            if release_lease:
+                await pipe.delete(f"{self.lease_prefix}{settings.replica_id}")
+            await pipe.execute()
+
+    async def pick_replica(self, redis: Redis) -> str | None:
+        """Pick the least loaded replica among those with a fresh heartbeat
+
+        Args:
+            redis: Redis connection instance
+
+        Returns:
+            Optional[str]: Replica ID or None if no replica sent a heartbeat recently
+        """
+        return await _PICK_REPLICA_SCRIPT(
+            keys=[self._alive_key, self._score_key],
+            args=[time.time() - settings.heartbeat_timeout, PLACEMENT_COST],
+            client=redis,
+        )
+
+    async def acquire_sweep(self, redis: Redis, interval: float) -> bool:
+        """Let one replica sweep orphaned rooms per interval
+
+        Args:
+            redis: Redis connection instance
+            interval: Sweep interval in seconds
+
+        Returns:
+            bool: True if this replica should sweep now
+        """
+        acquired = await redis.set(
+            self._sweeper_key, settings.replica_id, px=int(interval * 1000), nx=True
+        )
+        return bool(acquired)
+
+    async def prune_dead(self, redis: Redis) -> list[str]:
+        """Forget replicas without a fresh heartbeat
+
+        Args:
+            redis: Redis connection instance
+
+        Returns:
+            list[str]: Removed replica IDs
+        """
+        dead = await redis.zrangebyscore(
+            self._alive_key, "-inf", f"({time.time() - settings.heartbeat_timeout!r}"
+        )
+        if dead:
+            async with redis.pipeline(transaction=True) as pipe:
+                await pipe.zrem(self._alive_key, *dead)
+                await pipe.zrem(self._score_key, *dead)
+                await pipe.hdel(self._load_key, *dead)
+                await pipe.execute()
+        return dead
+
+
+replica_repo = ReplicaRepo()
@@ -1,39 +1,119 @@
 import json
 import time
-from typing import Any, TypeVar, cast
+import zlib
+from itertools import chain
+from typing import Any, cast
 
+import orjson
 from redis.asyncio import Redis
+from redis.client import NEVER_DECODE
 from redis.exceptions import RedisError
 
-from app_types.map import MapAndMeta, Point
-from app_types.room import LobbyRoom
+from app_types.common import PlayerStatus
+from app_types.map import Cell, CellType, GameMap, MapAndMeta, MapMeta, Point
+from app_types.room import (
+    LobbyPage,
+    LobbyRemoveEvent,
+    LobbyRoom,
+    LobbyRoomEvent,
+    RoomClaim,
+    RoomSnapshot,
+    SnapshotPlayer,
+)
 from exceptions.room import RoomError, RoomNotFoundError
+from repositories.replica import replica_repo
 from settings import settings
+from stores.redis import redis_manager
 from utils import make_room_key
 
-JsonType = str | int | float | bool | None | dict[str, Any] | list[Any]
-T = TypeVar("T")
-
-
-class MapAndMetaEncoder(json.JSONEncoder):
-    """Custom JSON encoder for handling MapAndMeta and Point objects"""
-
-    def default(self, o: object) -> JsonType:
-        if isinstance(o, Point):
-            return {"row": o.row, "col": o.col, "type": "Point"}
-        return super().default(o)
-
-    def encode(self, o: object) -> str:
-        def hint_tuples(item: Any) -> JsonType:
-            if isinstance(item, Point):
-                return self.default(item)
-            elif isinstance(item, (list, tuple)):
-                return [hint_tuples(e) for e in item]
-            elif isinstance(item, dict):
-                return {key: hint_tuples(value) for key, value in item.items()}
-            return item
-
-        return super().encode(hint_tuples(o))
+ROOM_FORMAT_MAGIC = b"\x00KR"
+ROOM_FORMAT_VERSION = 1
+ROOM_FLAG_COMPRESSED = 0b1
+
+CELL_TYPE_CODES: dict[CellType, str] = {
+    CellType.SPAWN: "s",
+    CellType.KING: "k",
+    CellType.BLOCKER: "b",
+    CellType.FIELD: "f",
+    CellType.CASTLE: "c",
+}
+CODE_CELL_TYPES: dict[str, CellType] = {code: type_ for type_, code in CELL_TYPE_CODES.items()}
+EMPTY_CELL_CODE = "."
+
+
+def encode_room(map_and_meta: MapAndMeta) -> bytes:
+    """Encode room data into the compact versioned binary format
+
+    Layout: magic, version byte, flags byte, then orjson payload (zlib-compressed if
+    flagged). Cell types are packed into one char per cell, power and owners are stored
+    as flat sparse [index, value, ...] lists and points as flat [row, col, ...] lists.
+    """
+    game_map, meta = map_and_meta["map"], map_and_meta["meta"]
+    height, width = len(game_map), len(game_map[0])
+    types: list[str] = []
+    power: list[int] = []
+    owners: list[int] = []
+    for index, cell in enumerate(chain.from_iterable(game_map)):
+        cell_type = cell.get("type")
+        types.append(CELL_TYPE_CODES[cell_type] if cell_type else EMPTY_CELL_CODE)
+        if "power" in cell:
+            power += (index, cell["power"])
+        if "player" in cell:
+            owners += (index, cell["player"])
+
+    payload = orjson.dumps(
+        {
+            "h": height,
+            "w": width,
+            "types": "".join(types),
+            "power": power,
+            "player": owners,
+            "poi": {
+                str(cell_type): list(chain.from_iterable(points))
+                for cell_type, points in meta["points_of_interest"].items()
+            },
+            "version": meta["version"],
+        }
+    )
+    flags = 0
+    if len(payload) >= settings.room_compress_min_bytes:
+        payload = zlib.compress(payload, 6)
+        flags |= ROOM_FLAG_COMPRESSED
+    return ROOM_FORMAT_MAGIC + bytes((ROOM_FORMAT_VERSION, flags)) + payload
+
+
+def decode_room(raw_data: bytes) -> MapAndMeta:
+    """Decode room data stored either in the binary format or as legacy JSON"""
+    if not raw_data.startswith(ROOM_FORMAT_MAGIC):
+        return cast(MapAndMeta, json.loads(raw_data, object_hook=map_and_meta_deserializer))
+
+    header_size = len(ROOM_FORMAT_MAGIC) + 2
+    version, flags = raw_data[len(ROOM_FORMAT_MAGIC) : header_size]
+    if version != ROOM_FORMAT_VERSION:
+        raise ValueError(f"Unsupported room format version {version}")
+
+    payload = raw_data[header_size:]
+    if flags & ROOM_FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    data = orjson.loads(payload)
+
+    cells: list[Cell] = [
+        {"type": CODE_CELL_TYPES[code]} if code != EMPTY_CELL_CODE else {} for code in data["types"]
+    ]
+    power, owners = data["power"], data["player"]
+    for i in range(0, len(power), 2):
+        cells[power[i]]["power"] = power[i + 1]
+    for i in range(0, len(owners), 2):
+        cells[owners[i]]["player"] = owners[i + 1]
+
+    width = data["w"]
+    game_map: GameMap = [cells[row * width : (row + 1) * width] for row in range(data["h"])]
+    points_of_interest = {
+        CellType(cell_type): [Point(flat[i], flat[i + 1]) for i in range(0, len(flat), 2)]
+        for cell_type, flat in data["poi"].items()
+    }
+    meta = MapMeta(points_of_interest=points_of_interest, version=data["version"])
+    return MapAndMeta(map=game_map, meta=meta)
 
 
 def map_and_meta_deserializer(obj: dict[str, Any]) -> Point | dict[str, Any]:
@@ -47,6 +127,91 @@ def map_and_meta_deserializer(obj: dict[str, Any]) -> Point | dict[str, Any]:
     return obj
 
 
+def encode_snapshot_meta(turn: int, meta: MapMeta, players: list[SnapshotPlayer]) -> bytes:
+    """Encode the part of a game snapshot that is rewritten in full every time"""
+    return orjson.dumps(
+        {
+            "turn": turn,
+            "players": [
+                {
+                    "id": player["id"],
+                    "nick": player["nick"],
+                    "color": player["color"],
+                    "status": player["status"],
+                    "init": list(player["init_point"]),
+                }
+                for player in players
+            ],
+            "poi": {
+                str(cell_type): list(chain.from_iterable(points))
+                for cell_type, points in meta["points_of_interest"].items()
+            },
+            "version": meta["version"],
+        }
+    )
+
+
+def encode_snapshot_tile(game_map: GameMap, bounds: tuple[int, int, int, int]) -> bytes:
+    """Encode one board tile the way encode_room packs the whole map
+
+    Indices of the sparse power and owner lists are relative to the tile, read row by row.
+    """
+    top, left, bottom, right = bounds
+    types: list[str] = []
+    power: list[int] = []
+    owners: list[int] = []
+    index = 0
+    for row in game_map[top:bottom]:
+        for cell in row[left:right]:
+            cell_type = cell.get("type")
+            types.append(CELL_TYPE_CODES[cell_type] if cell_type else EMPTY_CELL_CODE)
+            if "power" in cell:
+                power += (index, cell["power"])
+            if "player" in cell:
+                owners += (index, cell["player"])
+            index += 1
+
+    return orjson.dumps(
+        {"at": (top, left, right - left), "types": "".join(types), "power": power, "player": owners}
+    )
+
+
+def decode_snapshot(height: int, width: int, meta_data: str, tiles: list[str]) -> RoomSnapshot:
+    """Assemble a game snapshot from its meta and every tile of the board"""
+    data = orjson.loads(meta_data)
+    game_map: GameMap = [[{} for _ in range(width)] for _ in range(height)]
+    for raw_tile in tiles:
+        tile = orjson.loads(raw_tile)
+        top, left, tile_width = tile["at"]
+        cells: list[Cell] = []
+        for index, code in enumerate(tile["types"]):
+            cell: Cell = {"type": CODE_CELL_TYPES[code]} if code != EMPTY_CELL_CODE else {}
+            game_map[top + index // tile_width][left + index % tile_width] = cell
+            cells.append(cell)
+        power, owners = tile["power"], tile["player"]
+        for i in range(0, len(power), 2):
+            cells[power[i]]["power"] = power[i + 1]
+        for i in range(0, len(owners), 2):
+            cells[owners[i]]["player"] = owners[i + 1]
+
+    players = [
+        SnapshotPlayer(
+            id=player["id"],
+            nick=player["nick"],
+            color=player["color"],
+            status=PlayerStatus(player["status"]),
+            init_point=Point(*player["init"]),
+        )
+        for player in data["players"]
+    ]
+    points_of_interest = {
+        CellType(cell_type): [Point(flat[i], flat[i + 1]) for i in range(0, len(flat), 2)]
+        for cell_type, flat in data["poi"].items()
+    }
+    meta = MapMeta(points_of_interest=points_of_interest, version=data["version"])
+    return RoomSnapshot(turn=data["turn"], players=players, map=game_map, meta=meta)
+
+
 class RoomRepo:
     """Repository class for managing room data in Redis"""
 
@@ -79,10 +244,10 @@ class RoomRepo:
         try:
             pk: int = await self._get_next_id(redis)
             room_key: str = make_room_key(pk)
-            json_data = json.dumps(map_and_meta, cls=MapAndMetaEncoder)
-            await redis.setex(self._make_key(room_key), settings.room_ttl, json_data)
+            room_data = encode_room(map_and_meta)
+            await redis.setex(self._make_key(room_key), settings.room_ttl, room_data)
             return room_key
-        except (RedisError, TypeError, ValueError) as e:
+        except (RedisError, TypeError, ValueError, KeyError) as e:
             raise RoomError(f"Failed to save room: {e}") from e
 
     async def load_room(self, redis: Redis, room_key: str) -> MapAndMeta:
@@ -97,20 +262,52 @@ class RoomRepo:
 
         Raises:
             RoomNotFoundError: If room is not found
-            RoomSerializationError: If deserialization fails
+            RoomError: If deserialization fails
         """
-        try:
-            raw_data: str = await redis.get(self._make_key(room_key))
-            if not raw_data:
-                raise RoomNotFoundError(f"Room {room_key} not found")
+        return self.parse_room(await self.load_raw_room(redis, room_key))
 
-            data = json.loads(raw_data, object_hook=map_and_meta_deserializer)
-            return cast(MapAndMeta, data)
-        except json.JSONDecodeError as e:
-            raise RoomError(f"Failed to deserialize room data: {e}") from e
+    async def load_raw_room(self, redis: Redis, room_key: str) -> bytes:
+        """Load serialized room data from Redis without parsing it
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room key to load
+
+        Returns:
+            bytes: Serialized room map and metadata
+
+        Raises:
+            RoomNotFoundError: If room is not found
+            RoomError: If Redis operation fails
+        """
+        try:
+            raw_data: bytes | None = await redis.execute_command(
+                "GET", self._make_key(room_key), **{NEVER_DECODE: []}
+            )
         except RedisError as e:
             raise RoomError(f"Redis error while loading room: {e}") from e
 
+        if not raw_data:
+            raise RoomNotFoundError(f"Room {room_key} not found")
+        return raw_data
+
+    def parse_room(self, raw_data: bytes) -> MapAndMeta:
+        """Parse serialized room data, binary or legacy JSON
+
+        Args:
+            raw_data: Serialized room map and metadata
+
+        Returns:
+            MapAndMeta: Room map and metadata
+
+        Raises:
+            RoomError: If deserialization fails
+        """
+        try:
+            return decode_room(raw_data)
+        except (ValueError, KeyError, IndexError, zlib.error) as e:
+            raise RoomError(f"Failed to deserialize room data: {e}") from e
+
     async def remove_room(self, redis: Redis, room_key: str) -> None:
         """Remove room data from Redis
 
@@ -127,6 +324,215 @@ class RoomRepo:
             raise RoomError(f"Failed to remove room: {e}") from e
 
 
+class SnapshotRepo:
+    """Repository class for snapshots of games in progress
+
+    A snapshot is a hash with the board size and meta in fixed fields and one field per
+    board tile, so a write only carries the tiles that changed since the previous one.
+    """
+
+    def __init__(self) -> None:
+        self._snapshot_prefix: str = "__snapshots:rooms:"
+
+    def _make_key(self, room_key: str) -> str:
+        return f"{self._snapshot_prefix}{room_key}"
+
+    async def save_snapshot(
+        self,
+        redis: Redis,
+        room_key: str,
+        dimension: tuple[int, int],
+        meta_data: bytes,
+        tiles: dict[int, bytes],
+    ) -> None:
+        """Write snapshot meta along with the tiles changed since the previous write
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room identifier
+            dimension: Board height and width
+            meta_data: Encoded snapshot meta, see encode_snapshot_meta
+            tiles: Encoded tiles by tile index, see encode_snapshot_tile
+
+        Raises:
+            RoomError: If saving fails
+        """
+        height, width = dimension
+        fields: dict[str, bytes | int] = {f"t{index}": data for index, data in tiles.items()}
+        fields.update(h=height, w=width, meta=meta_data)
+        key = self._make_key(room_key)
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                await pipe.hset(key, mapping=fields)
+                await pipe.expire(key, settings.room_ttl)
+                await pipe.execute()
+        except RedisError as e:
+            raise RoomError(f"Failed to save snapshot: {e}") from e
+
+    async def load_snapshot(self, redis: Redis, room_key: str) -> RoomSnapshot | None:
+        """Load the latest snapshot of a game
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room identifier
+
+        Returns:
+            Optional[RoomSnapshot]: Snapshot or None if there is none
+
+        Raises:
+            RoomError: If Redis operation or deserialization fails
+        """
+        try:
+            fields: dict[str, str] = await redis.hgetall(self._make_key(room_key))
+        except RedisError as e:
+            raise RoomError(f"Redis error while loading snapshot: {e}") from e
+
+        if "meta" not in fields:
+            return None
+        tiles = [data for name, data in fields.items() if name.startswith("t")]
+        try:
+            return decode_snapshot(int(fields["h"]), int(fields["w"]), fields["meta"], tiles)
+        except (ValueError, KeyError, IndexError) as e:
+            raise RoomError(f"Failed to deserialize snapshot: {e}") from e
+
+    async def remove_snapshot(self, redis: Redis, room_key: str) -> None:
+        """Remove a game snapshot
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room identifier
+
+        Raises:
+            RoomError: If removal fails
+        """
+        try:
+            await redis.delete(self._make_key(room_key))
+        except RedisError as e:
+            raise RoomError(f"Failed to remove snapshot: {e}") from e
+
+
+# Keys known to the caller are passed in KEYS. Some keys only exist as values the
+# scripts read: the lease of a room's owner, the per-capacity lobby indexes and the
+# room hashes of a lobby page are derived in Lua. The scripts therefore need every
+# key on one Redis node and are not Redis Cluster compatible.
+_CLAIM_ROOM_SCRIPT = redis_manager.register_script(
+    """
+    local replica_id, room_key = ARGV[1], ARGV[3]
+    local owner = redis.call('GET', KEYS[1])
+    -- A room owned by a replica whose lease expired is free to take
+    if owner and owner ~= replica_id and redis.call('EXISTS', ARGV[6] .. owner) == 1 then
+        return {owner, 0, 0}
+    end
+    if redis.call('EXISTS', KEYS[2]) == 0 then
+        -- A game in progress lives on in its snapshot, the claimer resumes it
+        if owner ~= replica_id and redis.call('EXISTS', KEYS[4]) == 1 then
+            redis.call('SET', KEYS[1], replica_id, 'EX', ARGV[2])
+        end
+        return {replica_id, 0, 0}
+    end
+    if owner ~= replica_id then
+        redis.call('SET', KEYS[1], replica_id, 'EX', ARGV[2])
+    end
+
+    local room = redis.call('HMGET', KEYS[3], 'max_players', 'current_players')
+    if not room[1] then
+        return {replica_id, 1, 0}
+    end
+    if not redis.call('ZSCORE', KEYS[5], room_key) then
+        local created = ARGV[4]
+        redis.call('HSET', KEYS[3], 'created', created)
+        redis.call('PERSIST', KEYS[3])
+        redis.call('ZADD', KEYS[5], created, room_key)
+        redis.call('ZADD', KEYS[5] .. ':size:' .. room[1], created, room_key)
+        if tonumber(room[2]) < tonumber(room[1]) then
+            redis.call('ZADD', KEYS[6], created, room_key)
+            redis.call('ZADD', KEYS[6] .. ':' .. room[1], created, room_key)
+        end
+        local lobby_room = {
+            name = room_key,
+            max_players = tonumber(room[1]),
+            current_players = tonumber(room[2]),
+        }
+        redis.call('PUBLISH', ARGV[5], cjson.encode({at = 'room', room = lobby_room}))
+    end
+    return {replica_id, 1, 1}
+    """
+)
+
+
+_ROOM_REPLICA_SCRIPT = redis_manager.register_script(
+    """
+    local owner = redis.call('GET', KEYS[1])
+    if owner and redis.call('EXISTS', ARGV[1] .. owner) == 1 then
+        return owner
+    end
+    return false
+    """
+)
+
+_HAND_OFF_ROOM_SCRIPT = redis_manager.register_script(
+    """
+    local owner = redis.call('GET', KEYS[1])
+    if not owner or owner == ARGV[1] or redis.call('EXISTS', ARGV[4] .. owner) == 0 then
+        redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+        return ARGV[2]
+    end
+    return owner
+    """
+)
+
+# One batch of the lobby index, by rank, checked for rooms whose owner lost its
+# lease: a room still waiting for players is reopened with an empty counter, anything
+# else leaves the lobby. Entries without lobby data are dropped from every index,
+# the per-capacity ones come in KEYS after the lobby and free-slot indexes. Returns
+# the swept rooms and the rank of the next batch, or -1 after the last one.
+_SWEEP_ORPHANS_SCRIPT = redis_manager.register_script(
+    """
+    local lobby_key, free_key = KEYS[1], KEYS[2]
+    local lobby_prefix, shard_prefix, lease_prefix = ARGV[1], ARGV[2], ARGV[3]
+    local data_prefix, channel = ARGV[4], ARGV[5]
+    local start, batch_size = tonumber(ARGV[6]), tonumber(ARGV[7])
+    local batch = redis.call('ZRANGE', lobby_key, start, start + batch_size - 1)
+    local swept, removed = {}, 0
+    for _, room_key in ipairs(batch) do
+        local owner = redis.call('GET', shard_prefix .. room_key)
+        local room_hash = lobby_prefix .. room_key
+        local room = redis.call('HMGET', room_hash, 'max_players', 'created')
+        if not room[1] then
+            for i = 1, #KEYS do
+                redis.call('ZREM', KEYS[i], room_key)
+            end
+            removed = removed + 1
+        elseif owner and redis.call('EXISTS', lease_prefix .. owner) == 0 then
+            redis.call('DEL', shard_prefix .. room_key)
+            local size_suffix = ':' .. room[1]
+            if redis.call('EXISTS', data_prefix .. room_key) == 1 then
+                redis.call('HSET', room_hash, 'current_players', 0)
+                redis.call('ZADD', free_key, room[2] or 0, room_key)
+                redis.call('ZADD', free_key .. size_suffix, room[2] or 0, room_key)
+                local event = {at = 'players', name = room_key, current_players = 0}
+                redis.call('PUBLISH', channel, cjson.encode(event))
+            else
+                redis.call('DEL', room_hash)
+                redis.call('ZREM', lobby_key, room_key)
+                redis.call('ZREM', free_key, room_key)
+                redis.call('ZREM', lobby_key .. ':size' .. size_suffix, room_key)
+                redis.call('ZREM', free_key .. size_suffix, room_key)
+                redis.call('PUBLISH', channel, cjson.encode({at = 'remove', name = room_key}))
+                removed = removed + 1
+            end
+            swept[#swept + 1] = room_key
+        end
+    end
+    if #batch < batch_size then
+        return {swept, -1}
+    end
+    -- Removed entries shift the ones after them back by as many ranks
+    return {swept, start + batch_size - removed}
+    """
+)
+
+
 class ShardingRepo:
     def __init__(self) -> None:
         self._shard_prefix: str = "__shard:rooms:"
@@ -142,12 +548,14 @@ class ShardingRepo:
             room_key: Room identifier
 
         Returns:
-            Optional[str]: Replica ID or None if not found
+            Optional[str]: Replica ID or None if not found or its lease expired
 
         Raises:
             RoomError: If Redis operation fails
         """
-        replica_id = await redis.get(self._make_key(room_key))
+        replica_id = await _ROOM_REPLICA_SCRIPT(
+            keys=[self._make_key(room_key)], args=[replica_repo.lease_prefix], client=redis
+        )
         return replica_id
 
     async def set_room_replica(self, redis: Redis, room_key: str) -> None:
@@ -164,6 +572,129 @@ class ShardingRepo:
         """
         await redis.setex(self._make_key(room_key), settings.room_ttl, settings.replica_id)
 
+    async def claim_room(self, redis: Redis, room_key: str) -> RoomClaim:
+        """Claim a room for this replica, load its data and list it in the lobby at once
+
+        The claim is only taken if nobody else owns the room and its data or a snapshot of
+        its game still exists. A room prepared with LobbyRepository.prepare_room is listed
+        by the same call.
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room identifier
+
+        Returns:
+            RoomClaim: Owning replica, room data if this replica owns the room and it
+                exists (a started game only has a snapshot), and whether the room is
+                already listed in the lobby
+
+        Raises:
+            RoomError: If Redis operation fails
+        """
+        try:
+            replica, exists, listed = await _CLAIM_ROOM_SCRIPT(
+                keys=[
+                    self._make_key(room_key),
+                    room_repo._make_key(room_key),
+                    lobby_repo._make_room_key(room_key),
+                    snapshot_repo._make_key(room_key),
+                    lobby_repo._make_index_key(),
+                    lobby_repo._make_index_key(free_only=True),
+                ],
+                args=[
+                    settings.replica_id,
+                    settings.room_ttl,
+                    room_key,
+                    time.time(),
+                    lobby_repo.events_channel,
+                    replica_repo.lease_prefix,
+                ],
+                client=redis,
+            )
+        except RedisError as e:
+            raise RoomError(f"Redis error while claiming room: {e}") from e
+
+        raw_room = None
+        if replica == settings.replica_id and exists:
+            # Room data is binary while script replies are decoded, so it is read on its own
+            try:
+                raw_room = await room_repo.load_raw_room(redis, room_key)
+            except RoomNotFoundError:
+                pass
+        return RoomClaim(replica=replica, raw_room=raw_room, listed=bool(listed))
+
+    async def assign_room(self, redis: Redis, room_key: str, replica_id: str) -> None:
+        """Place a new room on a replica before anyone joins it
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room identifier
+            replica_id: Replica identifier
+
+        Raises:
+            RoomError: If Redis operation fails
+        """
+        await redis.set(self._make_key(room_key), replica_id, ex=settings.room_ttl, nx=True)
+
+    async def hand_off_room(self, redis: Redis, room_key: str, replica_id: str) -> str:
+        """Move a room owned by this replica, or by nobody alive, to another replica
+
+        Args:
+            redis: Redis connection instance
+            room_key: Room identifier
+            replica_id: Replica to move the room to
+
+        Returns:
+            str: Replica that owns the room afterwards
+        """
+        return await _HAND_OFF_ROOM_SCRIPT(
+            keys=[self._make_key(room_key)],
+            args=[settings.replica_id, replica_id, settings.room_ttl, replica_repo.lease_prefix],
+            client=redis,
+        )
+
+    async def sweep_orphans(self, redis: Redis, batch_size: int) -> list[str]:
+        """Release lobby rooms owned by replicas whose lease expired
+
+        The lobby is walked in batches, one script call each, so Redis is never blocked
+        for the whole lobby at once. Rooms changing between batches are checked on the
+        next sweep.
+
+        Args:
+            redis: Redis connection instance
+            batch_size: Lobby entries checked per script call
+
+        Returns:
+            list[str]: Keys of released rooms
+        """
+        capacity_keys = [
+            lobby_repo._make_index_key(free_only=free_only, max_players=max_players)
+            for max_players in await redis.smembers(lobby_repo.capacities_key)
+            for free_only in (False, True)
+        ]
+        swept: list[str] = []
+        start = 0
+        while start >= 0:
+            batch, start = await _SWEEP_ORPHANS_SCRIPT(
+                keys=[
+                    lobby_repo._make_index_key(),
+                    lobby_repo._make_index_key(free_only=True),
+                    *capacity_keys,
+                ],
+                args=[
+                    lobby_repo._room_prefix,
+                    self._shard_prefix,
+                    replica_repo.lease_prefix,
+                    room_repo._room_prefix,
+                    lobby_repo.events_channel,
+                    start,
+                    batch_size,
+                ],
+                client=redis,
+            )
+            swept.extend(batch)
+        return swept
+
     async def remove_room_replica(self, redis: Redis, room_key: str) -> None:
         """Remove room's replica mapping
 
@@ -177,58 +708,258 @@ class ShardingRepo:
         await redis.delete(self._make_key(room_key))
 
 
+# Lobby indexes are sorted sets scored by room creation time, all sharing the
+# lobby key as prefix: every room, rooms with free slots, and both of those
+# per room capacity (":size:<n>" and ":free:<n>"). Capacities in use are recorded
+# in the ":capacities" set, so the per-capacity indexes are found without a scan.
+_LOBBY_ADD_ROOM_SCRIPT = redis_manager.register_script(
+    """
+    local room_key, max_players, created = ARGV[1], ARGV[2], ARGV[3]
+    redis.call('HSET', KEYS[1], 'name', room_key, 'max_players', max_players,
+        'current_players', 0, 'created', created)
+    for i = 2, #KEYS - 1 do
+        redis.call('ZADD', KEYS[i], created, room_key)
+    end
+    redis.call('SADD', KEYS[#KEYS], max_players)
+    redis.call('PUBLISH', ARGV[4], ARGV[5])
+    """
+)
+
+_LOBBY_REMOVE_ROOM_SCRIPT = redis_manager.register_script(
+    """
+    local room_key = ARGV[1]
+    local max_players = redis.call('HGET', KEYS[1], 'max_players')
+    local removed = redis.call('DEL', KEYS[1])
+    redis.call('ZREM', KEYS[2], room_key)
+    redis.call('ZREM', KEYS[3], room_key)
+    if max_players then
+        redis.call('ZREM', KEYS[2] .. ':size:' .. max_players, room_key)
+        redis.call('ZREM', KEYS[3] .. ':' .. max_players, room_key)
+    end
+    if removed == 1 then
+        redis.call('PUBLISH', ARGV[2], ARGV[3])
+    end
+    return removed
+    """
+)
+
+# Join, leave and start run as one script each against the room hash, so the
+# counter and the free-slot indexes can't drift and a room that already left the
+# lobby is never recreated by a late counter update.
+_LOBBY_SLOTS_LIB = """
+    local function update_slots(room_hash, room_key, free_key, channel, current_players)
+        local room = redis.call('HMGET', room_hash, 'max_players', 'created')
+        local free_keys = {free_key, free_key .. ':' .. room[1]}
+        for _, free_key in ipairs(free_keys) do
+            if current_players < tonumber(room[1]) then
+                redis.call('ZADD', free_key, room[2] or 0, room_key)
+            else
+                redis.call('ZREM', free_key, room_key)
+            end
+        end
+        local event = {at = 'players', name = room_key, current_players = current_players}
+        redis.call('PUBLISH', channel, cjson.encode(event))
+        return current_players
+    end
+"""
+
+_LOBBY_JOIN_SCRIPT = redis_manager.register_script(
+    _LOBBY_SLOTS_LIB
+    + """
+    local room = redis.call('HMGET', KEYS[1], 'max_players', 'current_players')
+    if not room[1] or tonumber(room[2]) >= tonumber(room[1]) then
+        return false
+    end
+    local current_players = redis.call('HINCRBY', KEYS[1], 'current_players', 1)
+    return update_slots(KEYS[1], ARGV[1], KEYS[2], ARGV[2], current_players)
+    """
+)
+
+_LOBBY_LEAVE_SCRIPT = redis_manager.register_script(
+    _LOBBY_SLOTS_LIB
+    + """
+    local current_players = tonumber(redis.call('HGET', KEYS[1], 'current_players'))
+    if not current_players or current_players <= 0 then
+        return false
+    end
+    current_players = redis.call('HINCRBY', KEYS[1], 'current_players', -1)
+    return update_slots(KEYS[1], ARGV[1], KEYS[2], ARGV[2], current_players)
+    """
+)
+
+# A page resumes after the last room of the previous one, rooms sharing its score
+# included. Scores are compared as the strings Redis formats them with.
+_LOBBY_ROOMS_SCRIPT = redis_manager.register_script(
+    """
+    local index, limit = KEYS[1], tonumber(ARGV[1])
+    local last_score, last_member = ARGV[3], ARGV[4]
+    local entries
+    if last_score == '' then
+        entries = redis.call(
+            'ZREVRANGEBYSCORE', index, '+inf', '-inf', 'WITHSCORES', 'LIMIT', 0, limit)
+    elseif redis.call('ZSCORE', index, last_member) == last_score then
+        local start = redis.call('ZREVRANK', index, last_member) + 1
+        entries = redis.call('ZREVRANGE', index, start, start + limit - 1, 'WITHSCORES')
+    else
+        -- The last room left the index: skip the rooms of its score ordered before it
+        local seen = 0
+        for _, member in ipairs(redis.call('ZRANGEBYSCORE', index, last_score, last_score)) do
+            if member > last_member then
+                seen = seen + 1
+            end
+        end
+        entries = redis.call(
+            'ZREVRANGEBYSCORE', index, last_score, '-inf', 'WITHSCORES', 'LIMIT', seen, limit)
+    end
+    local rooms = {}
+    for i = 1, #entries, 2 do
+        rooms[#rooms + 1] = redis.call(
+            'HMGET', ARGV[2] .. entries[i], 'name', 'max_players', 'current_players')
+    end
+    if #entries == 0 then
+        return {rooms, false}
+    end
+    return {rooms, entries[#entries] .. ':' .. entries[#entries - 1]}
+    """
+)
+
+
 class LobbyRepository:
     def __init__(self):
         self._lobby_key = "lobby:rooms"
         self._room_prefix = "lobby:room:"
+        self.events_channel = "lobby:events"
+        # Capacities of every room ever prepared, names the per-capacity indexes
+        self.capacities_key = f"{self._lobby_key}:capacities"
 
     def _make_room_key(self, room_id: str) -> str:
         return f"{self._room_prefix}{room_id}"
 
-    async def add_room(self, redis: Redis, max_players: int, room_key: str) -> None:
-        """Add room to lobby with initial data"""
-        room_data = {"name": room_key, "max_players": max_players, "current_players": 0}
+    def _make_index_key(self, free_only: bool = False, max_players: int | str | None = None) -> str:
+        key = f"{self._lobby_key}:free" if free_only else self._lobby_key
+        if max_players is None:
+            return key
+        return f"{key}:{max_players}" if free_only else f"{key}:size:{max_players}"
+
+    async def prepare_room(self, redis: Redis, max_players: int, room_key: str) -> None:
+        """Store lobby data of a new room without listing it
+
+        ShardingRepo.claim_room lists the room once a replica takes it. Until then the
+        data expires together with the room itself.
+        """
+        room_data = LobbyRoom(name=room_key, max_players=max_players, current_players=0)
         async with redis.pipeline(transaction=True) as pipe:
             await pipe.hset(self._make_room_key(room_key), mapping=room_data)
-            await pipe.zadd(self._lobby_key, {room_key: time.time()})
+            await pipe.expire(self._make_room_key(room_key), settings.room_ttl)
+            await pipe.sadd(self.capacities_key, max_players)
             await pipe.execute()
 
-    async def add_players(self, redis: Redis, room_id: str) -> None:
-        await redis.hincrby(self._make_room_key(room_id), "current_players", 1)
+    async def add_room(self, redis: Redis, max_players: int, room_key: str) -> None:
+        """Add room to lobby with initial data and register it in every index"""
+        room_data = LobbyRoom(name=room_key, max_players=max_players, current_players=0)
+        event = LobbyRoomEvent(at="room", room=room_data)
+        await _LOBBY_ADD_ROOM_SCRIPT(
+            keys=[
+                self._make_room_key(room_key),
+                self._make_index_key(),
+                self._make_index_key(max_players=max_players),
+                self._make_index_key(free_only=True),
+                self._make_index_key(free_only=True, max_players=max_players),
+                self.capacities_key,
+            ],
+            args=[room_key, max_players, time.time(), self.events_channel, orjson.dumps(event)],
+            client=redis,
+        )
+
+    async def join_room(self, redis: Redis, room_id: str) -> bool:
+        """Reserve a lobby slot for a joining player
 
-    async def remove_player(self, redis: Redis, room_id: str) -> None:
-        await redis.hincrby(self._make_room_key(room_id), "current_players", -1)
+        Args:
+            redis: Redis client
+            room_id: Room identifier
+
+        Returns:
+            bool: False if the room is full or no longer listed, nothing is reserved then
+        """
+        current_players = await _LOBBY_JOIN_SCRIPT(
+            keys=[self._make_room_key(room_id), self._make_index_key(free_only=True)],
+            args=[room_id, self.events_channel],
+            client=redis,
+        )
+        return current_players is not None
+
+    async def leave_room(self, redis: Redis, room_id: str) -> None:
+        """Release a slot reserved by join_room, a no-op once the room left the lobby"""
+        await _LOBBY_LEAVE_SCRIPT(
+            keys=[self._make_room_key(room_id), self._make_index_key(free_only=True)],
+            args=[room_id, self.events_channel],
+            client=redis,
+        )
 
     async def get_rooms(
         self,
         redis: Redis,
-        offset: int = 0,
+        cursor: str | None = None,
         limit: int = 50,
-    ) -> list[LobbyRoom]:
-        room_ids = await redis.zrange(
-            self._lobby_key, start=offset, end=offset + limit - 1, desc=True
+        free_only: bool = False,
+        max_players: int | None = None,
+    ) -> LobbyPage:
+        """Fetch a page of lobby rooms, newest first, in one round trip
+
+        Args:
+            redis: Redis client
+            cursor: Creation score and key of the last room of the previous page,
+                as "score:key"
+            limit: Page size
+            free_only: Only list rooms with free slots
+            max_players: Only list rooms of this capacity
+
+        Returns:
+            LobbyPage: Rooms and the cursor of the next page, if there may be one
+        """
+        last_score, _, last_member = (cursor or "").partition(":")
+        rows, last_entry = await _LOBBY_ROOMS_SCRIPT(
+            keys=[self._make_index_key(free_only, max_players)],
+            args=[limit, self._room_prefix, last_score, last_member],
+            client=redis,
         )
+        rooms = [
+            LobbyRoom(
+                name=name,
+                max_players=int(players_limit),
+                current_players=int(current_players),
+            )
+            for name, players_limit, current_players in rows
+            if name is not None
+        ]
+        next_cursor = last_entry if last_entry and len(rows) == limit else None
+        return LobbyPage(rooms=rooms, next_cursor=next_cursor)
+
+    async def start_room(self, redis: Redis, room_id: str) -> bool:
+        """Take a room whose game started out of the lobby
 
-        rooms = []
-        for room_id in room_ids:
-            room_data = await redis.hgetall(self._make_room_key(room_id))
-            if room_data:
-                rooms.append(
-                    LobbyRoom(
-                        name=room_data["name"],
-                        max_players=int(room_data["max_players"]),
-                        current_players=int(room_data["current_players"]),
-                    )
-                )
-        return rooms
-
-    async def remove_room(self, redis: Redis, room_id: str) -> None:
-        async with redis.pipeline(transaction=True) as pipe:
-            await pipe.delete(self._make_room_key(room_id))
-            await pipe.zrem(self._lobby_key, room_id)
-            await pipe.execute()
+        Returns:
+            bool: True only for the call that actually removed the room
+        """
+        return await self.remove_room(redis, room_id)
+
+    async def remove_room(self, redis: Redis, room_id: str) -> bool:
+        event = LobbyRemoveEvent(at="remove", name=room_id)
+        return (
+            await _LOBBY_REMOVE_ROOM_SCRIPT(
+                keys=[
+                    self._make_room_key(room_id),
+                    self._make_index_key(),
+                    self._make_index_key(free_only=True),
+                ],
+                args=[room_id, self.events_channel, orjson.dumps(event)],
+                client=redis,
+            )
+            == 1
+        )
 
 
 lobby_repo = LobbyRepository()
 sharding_repo = ShardingRepo()
 room_repo = RoomRepo()
+snapshot_repo = SnapshotRepo()
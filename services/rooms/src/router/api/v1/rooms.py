@@ -1,13 +1,15 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from redis.asyncio import Redis
 
 from app_types.room import LobbyRoom
 from dependencies.store import get_redis_client
-from repositories.room import lobby_repo
+from exceptions.room import RoomNotFoundError
+from repositories.replay import replay_repo
 from schemas.map import MapAndMeta as MapAndMetaModel
-from schemas.room import NewRoom
+from schemas.room import NewRoom, RoomReplica
+from services.lobby import lobby_snapshot
 from services.room import room_manager
 
 rooms_router = APIRouter(prefix="/rooms")
@@ -26,8 +28,42 @@ async def create_room(
 
 @rooms_router.get("/", response_model=list[LobbyRoom])
 async def get_rooms(
+    response: Response,
     redis: Annotated[Redis, Depends(get_redis_client)],
     limit: int = Query(50, ge=1, le=50, description="Pagination limit"),
+    cursor: str | None = Query(
+        None,
+        pattern=r"^-?\d+(\.\d+)?(e[-+]?\d+)?:\S+$",
+        description="X-Next-Cursor of the previous page",
+    ),
+    free: bool = Query(False, description="Only rooms with free slots"),
+    max_players: int | None = Query(None, ge=1, description="Only rooms of this capacity"),
 ) -> list[LobbyRoom]:
-    """Get sorted list of available rooms"""
-    return await lobby_repo.get_rooms(redis, limit=limit)
+    """Get rooms sorted from newest, the next page cursor is sent in X-Next-Cursor"""
+    page = await lobby_snapshot.get_rooms(redis, limit, cursor, free, max_players)
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["rooms"]
+
+
+@rooms_router.get("/{room_key}/replica/", response_model=RoomReplica)
+async def get_room_replica(
+    room_key: str,
+    redis: Annotated[Redis, Depends(get_redis_client)],
+) -> RoomReplica:
+    """Get replica that owns the room, None until someone joins it"""
+    replica = await room_manager.locate_room(redis, room_key)
+    return RoomReplica(room_key=room_key, replica=replica)
+
+
+@rooms_router.get("/{room_key}/replay/", response_class=Response)
+async def get_room_replay(
+    room_key: str,
+    redis: Annotated[Redis, Depends(get_redis_client)],
+) -> Response:
+    """Get the recorded inputs of a finished game, played back by the replay socket"""
+    try:
+        replay = await replay_repo.load_replay(redis, room_key)
+    except RoomNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Replay not found")
+    return Response(replay, media_type="application/octet-stream")
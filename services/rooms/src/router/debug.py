@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from dependencies.debug import verify_debug_token
+from exceptions.replica import ProfilerBusy
+from schemas.replica import ProfileCaptureInfo
+from schemas.room import RoomDebug
+from services.profiler import sampling_profiler
+from services.room import room_manager
+
+# Every debug route needs the debug token, room keys are enough to join or watch a room
+debug_router = APIRouter(
+    prefix="/debug", tags=["debug"], dependencies=[Depends(verify_debug_token)]
+)
+
+
+@debug_router.get("/rooms/", response_model=list[RoomDebug])
+async def get_rooms() -> list[RoomDebug]:
+    """Rooms of this replica one by one, the detail /metrics only has totals of"""
+    return [
+        RoomDebug(
+            room_key=room.room_key,
+            status=room.status.name.lower(),
+            players=len(room.players),
+            turn=room.turn,
+            height=room.dimension[0],
+            width=room.dimension[1],
+            handed_off=room_manager.is_handed_off(room.room_key),
+        )
+        for room in list(room_manager.rooms.values())
+    ]
+
+
+@debug_router.post("/profile/", response_class=Response)
+async def profile(
+    seconds: float = Query(5.0, gt=0, le=60, description="Sampling duration"),
+) -> Response:
+    """Sample the event loop for a while and return the collapsed stacks for a flamegraph"""
+    try:
+        capture = await sampling_profiler.profile(seconds)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return Response(capture["folded"], media_type="text/plain")
+
+
+@debug_router.get("/profile/captures/", response_model=list[ProfileCaptureInfo])
+async def get_profile_captures() -> list[ProfileCaptureInfo]:
+    """Latest captures, requested or taken on turn overruns, oldest first"""
+    return [
+        ProfileCaptureInfo(
+            index=index,
+            started=capture["started"],
+            seconds=capture["seconds"],
+            reason=capture["reason"],
+            samples=capture["samples"],
+        )
+        for index, capture in enumerate(sampling_profiler.captures)
+    ]
+
+
+@debug_router.get("/profile/captures/{index}/", response_class=Response)
+async def get_profile_capture(index: int) -> Response:
+    """Collapsed stacks of a kept capture"""
+    try:
+        capture = sampling_profiler.captures[index]
+    except IndexError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Capture not found")
+    return Response(capture["folded"], media_type="text/plain")
+
+
+@debug_router.get("/rooms/{room_key}/trace/", response_class=Response)
+async def get_room_trace(room_key: str) -> Response:
+    """Traces of the last turns of a room as an OTLP/JSON export request"""
+    room = room_manager.rooms.get(room_key)
+    if room is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
+    return Response(room.flight_recorder.export(), media_type="application/json")
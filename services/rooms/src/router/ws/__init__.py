@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
+from .lobby import lobby_router
 from .rooms import rooms_router
 
 ws_router = APIRouter(prefix="/ws")
 ws_router.include_router(rooms_router)
+ws_router.include_router(lobby_router)
@@ -0,0 +1,19 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, WebSocket
+from redis.asyncio import Redis
+
+from dependencies.store import get_redis_client
+from services.lobby import lobby_feed
+
+lobby_router = APIRouter(prefix="/lobby", tags=["lobby"])
+
+
+@lobby_router.websocket("/")
+async def ws_lobby(
+    websocket: WebSocket,
+    redis: Annotated[Redis, Depends(get_redis_client)],
+):
+    """Live lobby feed: a snapshot on connect, then room/players/remove events"""
+    await websocket.accept()
+    await lobby_feed.serve(websocket, redis)
@@ -1,14 +1,32 @@
+import asyncio
+import contextlib
+import struct
+import zlib
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, WebSocket
+import orjson
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 from redis.asyncio import Redis
 
+from app_types.out_messages import AuthConfirmMessage, ReplayMessage
 from dependencies.store import get_redis_client
 from exceptions.player import PlayerTokenIsNotValid, PlayerWrongAuthFlow
-from exceptions.room import RoomInGameError, RoomNoSlots, RoomNotFoundError, RoomWrongReplica
+from exceptions.room import (
+    RoomError,
+    RoomInGameError,
+    RoomNoSlots,
+    RoomNotFoundError,
+    RoomPlayerLeft,
+    RoomWrongReplica,
+)
 from logger import get_logger
+from repositories.replay import replay_repo
+from services.auth import validate_token
+from services.loop_monitor import loop_monitor
 from services.player import WebsocketPlayer
 from services.room import room_manager
+from services.room.replays import GameReplay
+from settings import settings
 
 logger = get_logger(__name__)
 rooms_router = APIRouter(prefix="/rooms", tags=["rooms"])
@@ -28,9 +46,10 @@ async def ws_room(
         room = await room_manager.get_or_create_room(redis, room_key)
         player = WebsocketPlayer(user_id, username, room.dimension, websocket)
         await room_manager.play_with_room(redis, room, player)
-    except RoomWrongReplica:
+    except RoomWrongReplica as e:
         logger.info("Wrong replica", extra={"room_key": room_key, "user_id": user_id})
-        await websocket.close(code=1008, reason="Wrong replica")
+        # Clients reconnect with the owner as the replica query param, see the routing rules
+        await websocket.close(code=1008, reason=f"Wrong replica: {e.replica}")
     except RoomNoSlots:
         await websocket.close(code=4010, reason="There is not slots")
     except RoomInGameError:
@@ -41,6 +60,8 @@ async def ws_room(
         await websocket.close(code=4031, reason="Auth flow error")
     except RoomNotFoundError:
         await websocket.close(code=4040, reason="Room not found")
+    except RoomPlayerLeft:
+        logger.info("Player left before start", extra={"room_key": room_key, "user_id": user_id})
     except Exception as e:
         logger.error(
             "Unexpected error",
@@ -57,3 +78,111 @@ async def ws_room(
         await websocket.close(code=4999, reason="Something wrong")
     finally:
         await room_manager.cleanup(redis, room, player)
+
+
+@rooms_router.websocket("/{room_key}/replay/")
+async def ws_room_replay(
+    websocket: WebSocket,
+    room_key: str,
+    redis: Annotated[Redis, Depends(get_redis_client)],
+    speed: float = 4.0,
+):
+    """Play a finished game again, speed times faster than it was played"""
+    await websocket.accept()
+    if loop_monitor.shedding:
+        # Live games come first, replays wait until the replica catches up
+        await websocket.close(code=1013, reason="Try again later")
+        return
+    try:
+        replay = GameReplay(await replay_repo.load_replay(redis, room_key))
+    except RoomNotFoundError:
+        await websocket.close(code=4040, reason="Room not found")
+        return
+    except (RoomError, ValueError, KeyError, struct.error, zlib.error) as e:
+        logger.error("Replay is not available", extra={"room_key": room_key}, exc_info=e)
+        await websocket.close(code=4999, reason="Something wrong")
+        return
+
+    async def send_frame(message: ReplayMessage) -> None:
+        await websocket.send_text(orjson.dumps(message).decode())
+
+    try:
+        await replay.run(send_frame, min(max(speed, 1.0), settings.replay_max_speed))
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+
+@rooms_router.websocket("/{room_key}/watch/")
+async def ws_room_watch(
+    websocket: WebSocket,
+    room_key: str,
+    redis: Annotated[Redis, Depends(get_redis_client)],
+):
+    """Follow a game without a slot: the whole board every turn, nothing can be sent"""
+    await websocket.accept()
+    try:
+        await _authenticate_spectator(websocket)
+        room = await room_manager.get_room_to_watch(redis, room_key)
+    except WebSocketDisconnect:
+        return
+    except PlayerTokenIsNotValid:
+        await websocket.close(code=4030, reason="Auth error")
+        return
+    except PlayerWrongAuthFlow:
+        await websocket.close(code=4031, reason="Auth flow error")
+        return
+    except RoomWrongReplica as e:
+        await websocket.close(code=1008, reason=f"Wrong replica: {e.replica}")
+        return
+    except RoomNoSlots:
+        await websocket.close(code=4010, reason="There is not slots")
+        return
+    except RoomNotFoundError:
+        await websocket.close(code=4040, reason="Room not found")
+        return
+
+    feed = asyncio.create_task(room.spectators.watch(websocket.send_text))
+    disconnect = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        done, _ = await asyncio.wait((feed, disconnect), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (feed, disconnect):
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+        # The suppressed cancellation may be this handler's own, it must not be swallowed
+        current = asyncio.current_task()
+        if current is not None and current.cancelling():
+            raise asyncio.CancelledError()
+    if done == {feed} and feed.exception() is None:
+        # The feed ends with the game, or when the room moves to another replica
+        if room_manager.is_handed_off(room_key):
+            replica = await room_manager.locate_room(redis, room_key)
+            await websocket.close(code=1008, reason=f"Wrong replica: {replica}")
+        else:
+            await websocket.close()
+
+
+async def _authenticate_spectator(websocket: WebSocket) -> None:
+    """Spectators sign in like players do, with an auth message carrying their token"""
+    try:
+        message = await websocket.receive_json()
+    except ValueError:
+        raise PlayerWrongAuthFlow()
+    if (
+        not isinstance(message, dict)
+        or message.get("at") != "auth"
+        or not isinstance(message.get("token"), str)
+    ):
+        raise PlayerWrongAuthFlow()
+
+    if not await validate_token(message["token"]):
+        raise PlayerTokenIsNotValid()
+
+    await websocket.send_json(AuthConfirmMessage(at="auth", status=True))
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class ProfileCaptureInfo(BaseModel):
+    index: int
+    started: float
+    seconds: float
+    reason: str
+    samples: int
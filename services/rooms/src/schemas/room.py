@@ -5,7 +5,22 @@ class NewRoom(BaseModel):
     room_key: str
 
 
+class RoomReplica(BaseModel):
+    room_key: str
+    replica: str | None
+
+
 class Room(BaseModel):
     name: str
     max_players: int
     current_players: int
+
+
+class RoomDebug(BaseModel):
+    room_key: str
+    status: str
+    players: int
+    turn: int
+    height: int
+    width: int
+    handed_off: bool
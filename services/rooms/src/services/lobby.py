@@ -0,0 +1,208 @@
+import asyncio
+import contextlib
+import time
+from typing import Iterator, NamedTuple
+
+import orjson
+from fastapi import WebSocket
+from redis.asyncio import Redis
+
+from app_types.room import LobbyPage, LobbySnapshotEvent
+from logger import get_logger
+from repositories.room import lobby_repo
+from settings import settings
+from stores.redis import redis_manager
+
+logger = get_logger(__name__)
+
+
+class LobbyQuery(NamedTuple):
+    limit: int
+    free_only: bool
+    max_players: int | None
+
+
+class CachedPage(NamedTuple):
+    fetched: float
+    version: int
+    page: LobbyPage
+
+
+class LobbySnapshot:
+    """Short-lived per-replica copy of the first lobby page of each listing filter.
+
+    Concurrent pollers within the snapshot lifetime share one Redis fetch, lobby events
+    don't drop it, so each filter is fetched at most once per lifetime. Every page
+    remembers how many events were seen when its fetch started: a reader that must not
+    miss any event passes the count it already follows and gets a page at least that
+    recent. Deeper pages (requested with a cursor) always go to Redis.
+    """
+
+    def __init__(self, ttl: float, size: int = 50):
+        self._ttl = ttl
+        self._size = size
+        self._version = 0
+        self._pages: dict[LobbyQuery, CachedPage] = {}
+        self._pending: dict[LobbyQuery, tuple[int, asyncio.Task[LobbyPage]]] = {}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    async def get_rooms(
+        self,
+        redis: Redis,
+        limit: int,
+        cursor: str | None = None,
+        free_only: bool = False,
+        max_players: int | None = None,
+        since: int = 0,
+    ) -> LobbyPage:
+        if cursor is not None or limit > self._size:
+            return await lobby_repo.get_rooms(redis, cursor, limit, free_only, max_players)
+
+        query = LobbyQuery(limit, free_only, max_players)
+        cached = self._pages.get(query)
+        if (
+            cached is not None
+            and cached.version >= since
+            and time.monotonic() - cached.fetched < self._ttl
+        ):
+            return cached.page
+
+        pending = self._pending.get(query)
+        if pending is None or pending[0] < since:
+            task = asyncio.create_task(self._refresh(redis, query, self._version))
+            task.add_done_callback(lambda done: self._forget(query, done))
+            pending = self._pending[query] = (self._version, task)
+        return await asyncio.shield(pending[1])
+
+    def event_seen(self) -> None:
+        self._version += 1
+
+    def _forget(self, query: LobbyQuery, task: asyncio.Task[LobbyPage]) -> None:
+        pending = self._pending.get(query)
+        if pending is not None and pending[1] is task:
+            del self._pending[query]
+
+    async def _refresh(self, redis: Redis, query: LobbyQuery, version: int) -> LobbyPage:
+        page = await lobby_repo.get_rooms(
+            redis, limit=query.limit, free_only=query.free_only, max_players=query.max_players
+        )
+        now = time.monotonic()
+        self._pages = {
+            key: cached for key, cached in self._pages.items() if now - cached.fetched < self._ttl
+        }
+        cached = self._pages.get(query)
+        if cached is None or cached.version <= version:
+            self._pages[query] = CachedPage(now, version, page)
+        return page
+
+
+class LobbyFeed:
+    """Fans lobby events out from Redis pub/sub to this replica's WebSocket subscribers.
+
+    Each event is forwarded as the JSON text it was published with, so it is encoded once.
+    A subscriber that falls behind gets its backlog dropped and a fresh snapshot instead.
+    """
+
+    _RESYNC = None
+
+    def __init__(self, snapshot: LobbySnapshot, queue_size: int):
+        self._snapshot = snapshot
+        self._queue_size = queue_size
+        self._subscribers: set[asyncio.Queue[str | None]] = set()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def subscribers_count(self) -> int:
+        return len(self._subscribers)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    @contextlib.contextmanager
+    def subscribe(self) -> Iterator[asyncio.Queue[str | None]]:
+        queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=self._queue_size)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    async def serve(self, websocket: WebSocket, redis: Redis) -> None:
+        """Send a snapshot, then stream events until the client goes away"""
+        with self.subscribe() as events:
+            since = self._snapshot.version
+            forward = asyncio.create_task(self._forward(websocket, redis, events, since))
+            closed = asyncio.create_task(self._wait_closed(websocket))
+            done, pending = await asyncio.wait(
+                {forward, closed}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in pending:
+                task.cancel()
+            for task in done:
+                if not task.cancelled() and task.exception():
+                    logger.info("Lobby subscriber dropped", exc_info=task.exception())
+
+    async def _forward(
+        self,
+        websocket: WebSocket,
+        redis: Redis,
+        events: asyncio.Queue[str | None],
+        since: int,
+    ) -> None:
+        await self._send_snapshot(websocket, redis, since)
+        while True:
+            event = await events.get()
+            if event is self._RESYNC:
+                await self._send_snapshot(websocket, redis, self._snapshot.version)
+            else:
+                await websocket.send_text(event)
+
+    async def _send_snapshot(self, websocket: WebSocket, redis: Redis, since: int) -> None:
+        # Events from "since" on are queued for this subscriber, earlier ones must be in the page
+        page = await self._snapshot.get_rooms(redis, limit=50, since=since)
+        message = LobbySnapshotEvent(at="snapshot", rooms=page["rooms"])
+        await websocket.send_text(orjson.dumps(message).decode())
+
+    async def _wait_closed(self, websocket: WebSocket) -> None:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    def _fanout(self, event: str | None) -> None:
+        self._snapshot.event_seen()
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._RESYNC)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with redis_manager.client() as redis:
+                    async with redis.pubsub() as pubsub:
+                        await pubsub.subscribe(lobby_repo.events_channel)
+                        async for message in pubsub.listen():
+                            if message["type"] == "message":
+                                self._fanout(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Lobby feed connection lost", exc_info=e)
+                self._fanout(self._RESYNC)
+                await asyncio.sleep(1)
+
+
+lobby_snapshot = LobbySnapshot(settings.lobby_snapshot_ttl)
+lobby_feed = LobbyFeed(lobby_snapshot, settings.lobby_feed_queue_size)
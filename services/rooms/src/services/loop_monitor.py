@@ -0,0 +1,81 @@
+import asyncio
+import contextlib
+from collections import deque
+
+from app_types.replica import LoadLevel
+from logger import get_logger
+from metrics import EVENT_LOOP_LAG, LOAD_LEVEL
+from settings import settings
+
+logger = get_logger(__name__)
+
+
+class LoopMonitor:
+    """Samples the scheduling lag of the event loop and derives the replica's load level.
+
+    The lag is how late a short timer fires, which is how long every coroutine on the
+    loop waits to run. The level follows the worst lag of the last window, so it rises
+    on the first slow sample and only falls back once the whole window stayed fast.
+    """
+
+    def __init__(self, interval: float, window: float, degraded_lag: float, shed_lag: float):
+        self._interval = interval
+        self._degraded_lag = degraded_lag
+        self._shed_lag = shed_lag
+        self._samples: deque[float] = deque(maxlen=max(1, round(window / interval)))
+        self._task: asyncio.Task | None = None
+        self.lag = 0.0
+        self.level = LoadLevel.NORMAL
+        LOAD_LEVEL.set(self.level)
+
+    @property
+    def degraded(self) -> bool:
+        return self.level >= LoadLevel.DEGRADED
+
+    @property
+    def shedding(self) -> bool:
+        return self.level >= LoadLevel.SHEDDING
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self._interval)
+            self._observe(max(0.0, loop.time() - started - self._interval))
+
+    def _observe(self, lag: float) -> None:
+        EVENT_LOOP_LAG.observe(lag)
+        self._samples.append(lag)
+        self.lag = max(self._samples)
+        if self.lag >= self._shed_lag:
+            level = LoadLevel.SHEDDING
+        elif self.lag >= self._degraded_lag:
+            level = LoadLevel.DEGRADED
+        else:
+            level = LoadLevel.NORMAL
+
+        if level != self.level:
+            logger.warning(
+                "Replica load level changed",
+                extra={"level": level.name.lower(), "lag": round(self.lag, 3)},
+            )
+            self.level = level
+            LOAD_LEVEL.set(level)
+
+
+loop_monitor = LoopMonitor(
+    settings.loop_lag_interval,
+    settings.loop_lag_window,
+    settings.loop_lag_degraded,
+    settings.loop_lag_shed,
+)
@@ -1,21 +1,25 @@
 import asyncio
 import json
 from abc import ABC, abstractmethod
-from itertools import product
-from typing import Callable, Coroutine, Iterable
+from functools import lru_cache
+from typing import Callable, Coroutine, Iterator
 
-from bitarray import bitarray
-from fastapi import WebSocket
+from bitarray import bitarray, frozenbitarray
+from fastapi import WebSocket, WebSocketDisconnect
 from fastapi.websockets import WebSocketState
 
 from app_types.common import PlayerStatus
-from app_types.map import GameMap, Point
+from app_types.map import GameMap, Point, Viewport
 from app_types.messages import InMessage, OutMessage
 from app_types.out_messages import AuthConfirmMessage
+from app_types.room import SnapshotPlayer
 from exceptions.player import PlayerNotInit, PlayerTokenIsNotValid, PlayerWrongAuthFlow
 from logger import get_logger
-from metrics import WS_MESSAGE_SIZE
+from metrics import WS_MESSAGE_SIZE, WS_OUT_MESSAGE_SIZE
 from services.auth import validate_token
+from services.loop_monitor import loop_monitor
+from settings import settings
+from tracing import trace_count, trace_span
 
 logger = get_logger(__name__)
 
@@ -82,8 +86,19 @@ class Territory:
         self._invalidate_cache()
 
     def merge(self, other: "Territory") -> None:
+        # Territories of different players never overlap, the count is just the sum
+        count = self.count() + other.count()
         self._territory_mask |= other._territory_mask
         self._invalidate_cache()
+        self._cached_count = count
+
+    @property
+    def mask(self) -> bitarray:
+        return self._territory_mask
+
+    def indices(self) -> Iterator[int]:
+        """Row-major indices of owned cells, read straight from the mask"""
+        return self._territory_mask.search(bitarray("1"))
 
     def contains(self, point: Point) -> bool:
         return bool(self._territory_mask[self._coord.point_to_index(point)])
@@ -109,45 +124,50 @@ class Territory:
         self._cached_count = None
 
 
-class Visibility:
-    DIRECTIONS = tuple(product([-1, 0, 1], repeat=2))
+@lru_cache(maxsize=64)
+def column_stencil(map_width: int, map_height: int) -> tuple[frozenbitarray, frozenbitarray]:
+    """Masks of cells that have a left and a right neighbour, shared by every map of this shape"""
+    has_left = bitarray(map_width * map_height)
+    has_left.setall(1)
+    has_left[::map_width] = 0
+    has_right = bitarray(map_width * map_height)
+    has_right.setall(1)
+    has_right[map_width - 1 :: map_width] = 0
+    return frozenbitarray(has_left), frozenbitarray(has_right)
 
+
+class Visibility:
     def __init__(self, map_width: int, map_height: int):
         self._coord = MapCoordinator(map_width, map_height)
+        self._has_left, self._has_right = column_stencil(map_width, map_height)
         self._visible_mask = bitarray(self._coord._array_size)
-        self._new_visible_mask = bitarray(self._coord._array_size)
+        self._diff_mask = bitarray(self._coord._array_size)
         self._visible_mask.setall(0)
-        self._new_visible_mask.setall(0)
+        self._diff_mask.setall(0)
         self._cached_points = None
-        self._direction_cache = {}
-
-    def update(self, territory_points: Iterable[Point]) -> tuple[Point, ...]:
-        self._new_visible_mask.setall(0)
 
-        for point in territory_points:
-            cache_key = (point.row, point.col)
-            if cache_key not in self._direction_cache:
-                self._direction_cache[cache_key] = self._calculate_visible_points(point)
+    def update(self, territory_mask: bitarray) -> tuple[Point, ...]:
+        # 3x3 neighbourhood as a dilation: spread along rows, then across them
+        width = self._coord._map_width
+        rows = territory_mask | ((territory_mask << 1) & self._has_right)
+        rows |= (territory_mask >> 1) & self._has_left
+        new_visible_mask = rows | (rows << width) | (rows >> width)
 
-            for idx in self._direction_cache[cache_key]:
-                self._new_visible_mask[idx] = 1
-
-        diff_mask = self._new_visible_mask ^ self._visible_mask
+        # Changes add up until refresh_points takes them, a takeover updates mid-turn too
+        self._diff_mask |= new_visible_mask ^ self._visible_mask
         diff_points = tuple(
-            self._coord.index_to_point(i) for i in range(self._coord._array_size) if diff_mask[i]
+            self._coord.index_to_point(i) for i in self._diff_mask.search(bitarray("1"))
         )
 
-        self._visible_mask = self._new_visible_mask.copy()
+        self._visible_mask = new_visible_mask
         self._cached_points = None
         return diff_points
 
-    def _calculate_visible_points(self, point: Point) -> set[int]:
-        visible_indices = set()
-        for dr, dc in self.DIRECTIONS:
-            new_row, new_col = point.row + dr, point.col + dc
-            if self._coord.is_valid_position(new_row, new_col):
-                visible_indices.add(self._coord.point_to_index(Point(new_row, new_col)))
-        return visible_indices
+    def refresh_points(self, dirty_mask: bitarray) -> tuple[Point, ...]:
+        """Visible points that changed visibility on the last update or lie in dirty cells"""
+        refresh_mask = self._visible_mask & (dirty_mask | self._diff_mask)
+        self._diff_mask.setall(0)
+        return tuple(self._coord.index_to_point(i) for i in refresh_mask.search(bitarray("1")))
 
     def visible_points(self) -> tuple[Point, ...]:
         if self._cached_points is None:
@@ -157,7 +177,6 @@ class Visibility:
         return self._cached_points
 
     def clear_cache(self) -> None:
-        self._direction_cache.clear()
         self._cached_points = None
 
 
@@ -170,6 +189,7 @@ class Player(ABC):
         self._color: int | None = None
 
         map_height, map_width = map_size
+        self._map_size = map_size
         self.territory = Territory(map_width, map_height)
         self.visibility = Visibility(map_width, map_height)
         self.moves: asyncio.Queue[tuple[Point, Point]] = asyncio.Queue()
@@ -179,6 +199,7 @@ class Player(ABC):
         self._disconnect_handler: OnDisconnectType | None = None
         self.cursor: Point | None = None
         self.prev_cursor: Point | None = None
+        self.viewport: Viewport | None = None
         self.pov: GameMap = self._generate_empty_map(map_width, map_height)
 
     def _generate_empty_map(self, width: int, height: int) -> GameMap:
@@ -204,6 +225,33 @@ class Player(ABC):
         self._init_point = init_point
         self.territory.add_point(init_point)
 
+    def snapshot(self) -> SnapshotPlayer:
+        return SnapshotPlayer(
+            id=self.id,
+            nick=self.nick,
+            color=self.color,
+            status=self.status,
+            init_point=self.init_point,
+        )
+
+    def restore(self, state: SnapshotPlayer, game_map: GameMap) -> None:
+        """Take the player's place back in a game resumed from a snapshot"""
+        self._status = state["status"]
+        self._color = state["color"]
+        self._init_point = state["init_point"]
+        if self._status == PlayerStatus.LOSER:
+            return
+        # Territory is exactly the cells the player owns on the board
+        self.territory.batch_add_points(
+            [
+                Point(row, col)
+                for row, line in enumerate(game_map)
+                for col, cell in enumerate(line)
+                if cell.get("player") == self.id
+            ]
+        )
+        self.territory.apply_batch_updates()
+
     @property
     def hold(self) -> tuple[Point, ...]:
         return self.territory.points()
@@ -213,7 +261,22 @@ class Player(ABC):
         return self.visibility.visible_points()
 
     def update_visible_cells(self) -> tuple[Point, ...]:
-        return self.visibility.update(self.hold)
+        return self.visibility.update(self.territory.mask)
+
+    def set_viewport(self, row: int, col: int, height: int, width: int) -> None:
+        """Clamp the declared screen rectangle to the map and widen it by the margin"""
+        map_height, map_width = self._map_size
+        margin = settings.viewport_margin
+        height = min(max(height, 1), settings.viewport_max_size)
+        width = min(max(width, 1), settings.viewport_max_size)
+        # A rectangle scrolled past the edge still keeps at least its nearest map cell
+        row = min(max(row, 0), map_height - 1)
+        col = min(max(col, 0), map_width - 1)
+        top = max(row - margin, 0)
+        left = max(col - margin, 0)
+        bottom = min(row + height + margin, map_height)
+        right = min(col + width + margin, map_width)
+        self.viewport = Viewport(top, left, bottom - top, right - left)
 
     async def move(self, prev: Point | None, current: Point | None) -> None:
         if prev and current:
@@ -250,13 +313,17 @@ class Player(ABC):
         self._status = PlayerStatus.STOPPED
 
     async def _receive_loop(self) -> None:
+        # Waits on the socket without a timeout: stop_listening cancels the loop and a dead
+        # peer is dropped by the server's WebSocket ping/pong, see ROOMS_WS_PING_INTERVAL
         while self._status != PlayerStatus.STOPPED:
             try:
-                message = await asyncio.wait_for(self.receive_json(), 1)
+                message = await self.receive_json()
                 if self._message_handler:
                     await self._message_handler(self, message)
-            except asyncio.TimeoutError:
-                continue
+            except WebSocketDisconnect:
+                if self._disconnect_handler:
+                    await self._disconnect_handler(self)
+                break
             except Exception as e:
                 logger.error("Message handling error", exc_info=e)
                 if self._disconnect_handler:
@@ -294,7 +361,7 @@ class Player(ABC):
 
     def takeover_kingdom(self, other: "Player") -> None:
         self.territory.merge(other.territory)
-        other.territory.clear()
+        self.update_visible_cells()
         other.set_lose()
 
     @property
@@ -313,6 +380,14 @@ class Player(ABC):
     async def send_json(self, message: OutMessage) -> None:
         pass
 
+    @abstractmethod
+    async def send_text(self, text: str) -> None:
+        """Send a message encoded once for many receivers"""
+
+    @abstractmethod
+    async def close(self, code: int, reason: str) -> None:
+        pass
+
     def __hash__(self) -> int:
         return hash(self.id)
 
@@ -343,11 +418,25 @@ class WebsocketPlayer(Player):
 
     async def send_json(self, message: OutMessage) -> None:
         if self.websocket.client_state == WebSocketState.CONNECTED:
-            text_message = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
-            WS_MESSAGE_SIZE.labels(direction="out", message_type=message["at"]).observe(
-                len(text_message)
-            )
-            await self.websocket.send_text(text_message)
+            with trace_span("encode", player=self.id):
+                text_message = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+            # Frame sizes are not critical, they wait until the event loop catches up
+            if not loop_monitor.degraded:
+                size = WS_OUT_MESSAGE_SIZE.get(message["at"])
+                if size is None:
+                    size = WS_MESSAGE_SIZE.labels(direction="out", message_type=message["at"])
+                size.observe(len(text_message))
+            await self.send_text(text_message)
+
+    async def send_text(self, text: str) -> None:
+        if self.websocket.client_state == WebSocketState.CONNECTED:
+            trace_count("frame_bytes", len(text))
+            with trace_span("send", player=self.id):
+                await self.websocket.send_text(text)
+
+    async def close(self, code: int, reason: str) -> None:
+        if self.websocket.client_state == WebSocketState.CONNECTED:
+            await self.websocket.close(code=code, reason=reason)
 
     def __repr__(self) -> str:
         return f"WebsocketPlayer(id={self.id}, nick={self.nick})"
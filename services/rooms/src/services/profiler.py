@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from types import FrameType
+
+from app_types.replica import ProfileCapture
+from exceptions.replica import ProfilerBusy
+from logger import get_logger
+from settings import settings
+
+logger = get_logger(__name__)
+
+
+class SamplingProfiler:
+    """Statistical profiler of the event loop thread.
+
+    A helper thread looks at the loop thread's stack every interval and counts identical
+    stacks, so the loop itself pays nothing but the GIL hand-offs. Profiles come out in the
+    collapsed stack format ("frame;frame;frame count" lines) read by flamegraph.pl and
+    speedscope. The last few captures are kept in memory.
+    """
+
+    def __init__(self, interval: float, keep: int, cooldown: float):
+        self._interval = interval
+        self._cooldown = cooldown
+        self.captures: deque[ProfileCapture] = deque(maxlen=keep)
+        self._busy = False
+        self._last_triggered = float("-inf")
+        self._task: asyncio.Task | None = None
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    async def profile(self, seconds: float, reason: str = "request") -> ProfileCapture:
+        """Sample the event loop for a number of seconds, must be awaited on the loop
+
+        Raises:
+            ProfilerBusy: If another capture is running
+        """
+        if self._busy:
+            raise ProfilerBusy("A profile is already being captured")
+
+        self._busy = True
+        try:
+            started = time.time()
+            stacks = await asyncio.to_thread(self._sample, threading.get_ident(), seconds)
+        finally:
+            self._busy = False
+
+        capture = ProfileCapture(
+            started=started,
+            seconds=seconds,
+            reason=reason,
+            samples=sum(stacks.values()),
+            folded="".join(f"{stack} {count}\n" for stack, count in stacks.most_common()),
+        )
+        self.captures.append(capture)
+        return capture
+
+    def trigger(self, reason: str, seconds: float) -> None:
+        """Start a capture in the background unless one ran within the cooldown"""
+        now = time.monotonic()
+        if self._busy or now - self._last_triggered < self._cooldown:
+            return
+
+        self._last_triggered = now
+        logger.warning("Profiling the event loop", extra={"reason": reason, "seconds": seconds})
+        self._task = asyncio.create_task(self.profile(seconds, reason))
+
+    def _sample(self, thread_id: int, seconds: float) -> Counter[str]:
+        stacks: Counter[str] = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                stacks[self._collapse(frame)] += 1
+            del frame
+            time.sleep(self._interval)
+        return stacks
+
+    @staticmethod
+    def _collapse(frame: FrameType | None) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            filename = os.path.basename(code.co_filename)
+            names.append(f"{code.co_qualname} ({filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+sampling_profiler = SamplingProfiler(
+    settings.profiler_interval, settings.profiler_keep, settings.profile_cooldown
+)
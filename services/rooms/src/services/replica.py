@@ -0,0 +1,132 @@
+import asyncio
+import contextlib
+import signal
+import time
+from types import FrameType
+from typing import Any, Callable
+
+from redis.asyncio import Redis
+
+from app_types.replica import ReplicaLoad
+from logger import get_logger
+from repositories.replica import replica_repo
+from repositories.room import sharding_repo
+from services.loop_monitor import loop_monitor
+from services.room import room_manager
+from settings import settings
+from stores.redis import redis_manager
+
+logger = get_logger(__name__)
+
+SignalHandler = Callable[[int, FrameType | None], Any] | int | None
+
+
+class ReplicaMonitor:
+    """Measures this replica's load and reports it to Redis every heartbeat interval.
+
+    The heartbeat also renews the replica lease. Once per sweep interval one replica of
+    the cluster releases rooms of replicas whose lease expired.
+    """
+
+    def __init__(self, interval: float, sweep_interval: float):
+        self._interval = interval
+        self._sweep_interval = sweep_interval
+        self._task: asyncio.Task | None = None
+        self.cpu = 0.0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    def load(self) -> ReplicaLoad:
+        rooms = room_manager.rooms.values()
+        return ReplicaLoad(
+            rooms=len(rooms),
+            players=sum(len(room.players) for room in rooms),
+            lag=loop_monitor.lag,
+            cpu=self.cpu,
+        )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started, cpu_started = loop.time(), time.process_time()
+            await asyncio.sleep(self._interval)
+            elapsed = loop.time() - started
+            self.cpu = (time.process_time() - cpu_started) / elapsed
+            # A shedding replica keeps its lease and rooms but takes no new ones
+            placeable = not room_manager.draining and not loop_monitor.shedding
+            try:
+                async with redis_manager.client() as redis:
+                    await replica_repo.heartbeat(redis, self.load(), placeable=placeable)
+                    if await replica_repo.acquire_sweep(redis, self._sweep_interval):
+                        await self._sweep(redis)
+            except Exception as e:
+                logger.error("Replica heartbeat failed", exc_info=e)
+
+    async def _sweep(self, redis: Redis) -> None:
+        dead = await replica_repo.prune_dead(redis)
+        released = await sharding_repo.sweep_orphans(redis, settings.sweep_batch_size)
+        if dead or released:
+            logger.info("Swept dead replicas", extra={"replicas": dead, "rooms": released})
+
+
+class ReplicaDrain:
+    """Drains the replica on SIGTERM before the server closes any connection.
+
+    Uvicorn closes every WebSocket as soon as it gets the signal, before the lifespan
+    shutdown runs. So the drain takes the signal over and passes it on to the previous
+    handler once waiting rooms are handed off and running games are done. A second
+    signal skips the rest of the drain.
+    """
+
+    def __init__(self, timeout: float):
+        self._timeout = timeout
+        self._task: asyncio.Task | None = None
+
+    def install(self, signum: int = signal.SIGTERM) -> None:
+        loop = asyncio.get_running_loop()
+        previous = signal.getsignal(signum)
+
+        def handle(received: int, frame: FrameType | None) -> None:
+            if self._task is None:
+                loop.call_soon_threadsafe(self._start, previous, received, frame)
+            else:
+                self._pass_on(previous, received, frame)
+
+        signal.signal(signum, handle)
+
+    async def drain(self) -> None:
+        logger.info("Draining replica", extra={"rooms": len(room_manager.rooms)})
+        async with redis_manager.client() as redis:
+            room_manager.draining = True
+            await replica_repo.withdraw(redis)
+            await room_manager.drain(redis, self._timeout)
+
+    def _start(self, previous: SignalHandler, signum: int, frame: FrameType | None) -> None:
+        async def drain_and_pass_on() -> None:
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.error("Replica drain failed", exc_info=e)
+            self._pass_on(previous, signum, frame)
+
+        if self._task is None:
+            self._task = asyncio.create_task(drain_and_pass_on())
+
+    def _pass_on(self, previous: SignalHandler, signum: int, frame: FrameType | None) -> None:
+        if callable(previous):
+            previous(signum, frame)
+        else:
+            signal.signal(signum, previous)
+            signal.raise_signal(signum)
+
+
+replica_monitor = ReplicaMonitor(settings.heartbeat_interval, settings.sweep_interval)
+replica_drain = ReplicaDrain(settings.drain_timeout)
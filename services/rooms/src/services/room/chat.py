@@ -0,0 +1,82 @@
+import asyncio
+import time
+from collections import deque
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING
+
+import orjson
+
+from app_types.messages import ChatBatchMessage, ChatMessage
+from metrics import CHAT_MESSAGES
+from services.loop_monitor import loop_monitor
+from settings import settings
+
+if TYPE_CHECKING:
+    from services.player import Player
+    from services.room.game_room import GameRoom
+
+
+class ChatChannel:
+    """Chat of a room, kept apart from the receive loops of players.
+
+    Posting never waits for delivery: messages are collected for a short window and sent
+    to everyone as one frame encoded once. Each user may post at the configured rate with
+    some burst, the latest messages are kept for players who join later.
+    """
+
+    def __init__(self, room: "GameRoom"):
+        self._room = room
+        self._pending: list[ChatMessage] = []
+        self._history: deque[ChatMessage] = deque(maxlen=settings.chat_history_size)
+        self._allowance: dict[int, tuple[float, float]] = {}
+        self._task: asyncio.Task | None = None
+
+    def post(self, player: "Player", text: str) -> bool:
+        text = text.strip()[: settings.chat_max_length]
+        if not text:
+            return False
+        if not self._allow(player.id):
+            CHAT_MESSAGES["limited"].inc()
+            return False
+
+        CHAT_MESSAGES["accepted"].inc()
+        message = ChatMessage(
+            at="chat",
+            user_id=player.id,
+            username=player.nick,
+            message=text,
+            timestamp=datetime.now(UTC).isoformat(),
+        )
+        self._pending.append(message)
+        self._history.append(message)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._deliver())
+        return True
+
+    async def send_history(self, player: "Player") -> None:
+        if self._history:
+            frame = ChatBatchMessage(at="chats", messages=list(self._history))
+            await self._room.send_frame(player, orjson.dumps(frame).decode())
+
+    def _allow(self, user_id: int) -> bool:
+        """Token bucket of the user, refilled at the chat rate up to the burst"""
+        now = time.monotonic()
+        tokens, updated = self._allowance.get(user_id, (settings.chat_burst, now))
+        tokens = min(settings.chat_burst, tokens + (now - updated) * settings.chat_rate)
+        if tokens < 1:
+            self._allowance[user_id] = (tokens, now)
+            return False
+        self._allowance[user_id] = (tokens - 1, now)
+        return True
+
+    async def _deliver(self) -> None:
+        while self._pending:
+            # Chat can wait while the event loop is behind, the window grows under load
+            window = settings.chat_batch_window
+            await asyncio.sleep(
+                window * settings.shed_update_every if loop_monitor.degraded else window
+            )
+            messages, self._pending = self._pending, []
+            frame = orjson.dumps(ChatBatchMessage(at="chats", messages=messages)).decode()
+            players = list(self._room.players.values())
+            await asyncio.gather(*(self._room.send_frame(player, frame) for player in players))
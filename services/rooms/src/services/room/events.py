@@ -0,0 +1,71 @@
+import asyncio
+from collections import deque
+from typing import Any
+
+import orjson
+
+from app_types.map import Point
+from app_types.room import GameEvent
+from logger import get_logger
+from metrics import GAME_EVENTS_DROPPED
+from repositories.event import event_repo
+from settings import settings
+from stores.redis import redis_manager
+
+logger = get_logger(__name__)
+
+# Writes outlive the game state that starts them, they are kept here until done
+_event_writes: set[asyncio.Task] = set()
+
+
+class GameEvents:
+    """Collects a room's game events during turns and publishes them off the turn path.
+
+    Events of a turn go out in one pipeline. While a write is in flight new events wait
+    for it and go out with the next one, so a slow Redis delays the stream but never a
+    turn. The stream is best effort: events of a failed write are dropped, and while
+    Redis is down only the latest ROOMS_EVENT_BUFFER_SIZE events wait for it.
+    """
+
+    def __init__(self, room_key: str):
+        self._room_key = room_key
+        self._pending: deque[GameEvent] = deque(maxlen=settings.event_buffer_size)
+        self._task: asyncio.Task | None = None
+
+    def captures(self, turn: int, map_diff: dict[Point, tuple[int | None, int | None]]) -> None:
+        """Cells that changed owner: row, col, new owner and previous owner, 0 for nobody"""
+        if map_diff:
+            cells = [(row, col, new or 0, old or 0) for (row, col), (old, new) in map_diff.items()]
+            self.add("captures", turn, cells)
+
+    def add(self, kind: str, turn: int, data: Any) -> None:
+        if len(self._pending) == self._pending.maxlen:
+            GAME_EVENTS_DROPPED["overflow"].inc()
+        self._pending.append(GameEvent(type=kind, turn=turn, data=orjson.dumps(data)))
+
+    def flush(self) -> None:
+        if self._pending and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._write())
+            _event_writes.add(self._task)
+            self._task.add_done_callback(_event_writes.discard)
+
+    def stop(self) -> None:
+        """Drop the events of a room that goes away before its game ends"""
+        self._pending.clear()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def _write(self) -> None:
+        while self._pending:
+            events = list(self._pending)
+            self._pending.clear()
+            try:
+                async with redis_manager.client() as redis:
+                    await event_repo.publish(redis, self._room_key, events)
+            except Exception as e:
+                GAME_EVENTS_DROPPED["failed"].inc(len(events))
+                logger.error(
+                    "Game events were not published",
+                    extra={"room_key": self._room_key, "events": len(events)},
+                    exc_info=e,
+                )
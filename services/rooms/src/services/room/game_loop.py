@@ -1,12 +1,18 @@
 import asyncio
 import time
 
+from services.profiler import sampling_profiler
 from services.room.strategies import GameLoopStrategy
+from settings import settings
+from tracing import FlightRecorder, trace_span
+
+TURN_INTERVAL = 0.7
 
 
 class GameLoop:
-    def __init__(self, strategy: GameLoopStrategy):
+    def __init__(self, strategy: GameLoopStrategy, recorder: FlightRecorder):
         self._strategy = strategy
+        self._recorder = recorder
         self._task: asyncio.Task = asyncio.create_task(self._loop())
         self._current_turn: int = 0
         self._should_stop: bool = False
@@ -19,6 +25,14 @@ class GameLoop:
     async def start(self) -> None:
         self._start_loop.set()
 
+    def resume_from(self, turn: int) -> None:
+        """Continue the turn count of a game restored from a snapshot"""
+        self._current_turn = turn
+
+    def finish(self) -> None:
+        """End the game after the current turn, as if it was done"""
+        self._should_stop = True
+
     async def stop(self) -> None:
         self._should_stop = True
         if self._task and not self._task.done():
@@ -36,10 +50,23 @@ class GameLoop:
         while not self._should_stop and not self._strategy.is_game_done():
             self._current_turn += 1
             start = time.perf_counter()
-            await self._strategy.init_turn(self._current_turn)
-            self._strategy.make_turn()
-            await self._strategy.finish_turn()
+            try:
+                with self._recorder.turn(self._current_turn):
+                    with trace_span("init_turn"):
+                        await self._strategy.init_turn(self._current_turn)
+                    self._strategy.make_turn()
+                    await self._strategy.finish_turn()
+            except Exception:
+                self._recorder.dump("error")
+                raise
             elapsed = time.perf_counter() - start
-            await asyncio.sleep(max(0.7 - elapsed, 0))
+            if elapsed > settings.turn_budget:
+                self._recorder.dump("overrun")
+                if settings.profile_on_overrun:
+                    sampling_profiler.trigger(
+                        f"turn {self._current_turn} took {elapsed:.3f}s",
+                        settings.profile_overrun_seconds,
+                    )
+            await asyncio.sleep(max(TURN_INTERVAL - elapsed, 0))
 
         await self._strategy.finish_game()
@@ -1,14 +1,18 @@
 import asyncio
-from typing import Callable
+from typing import Callable, Iterable, cast
 
 from app_types.common import GameStatus
 from app_types.map import CellType, GameMap, MapMeta, Point
 from app_types.messages import InMessage, OutMessage
+from app_types.out_messages import GameStat, PlayerData, WatchMessage
+from app_types.room import RoomSnapshot
 from logger import get_logger
-from metrics import GAME_STATE
 from services.player import Player
+from services.room.chat import ChatChannel
 from services.room.game_states import GameFinished, GameInProgressState, GameState, WaitingState
+from services.room.spectators import SpectatorFeed
 from settings import settings
+from tracing import FlightRecorder
 
 logger = get_logger(__name__)
 
@@ -16,19 +20,37 @@ MessageType = OutMessage | Callable[["Player"], OutMessage]
 
 
 class GameRoom:
-    def __init__(self, room_key: str, game_map: GameMap, meta: MapMeta):
-        self.game_map: GameMap = self.prepare_map(game_map)
+    def __init__(self, room_key: str, game_map: GameMap, meta: MapMeta, prepared: bool = False):
+        self.game_map: GameMap = game_map if prepared else self.prepare_map(game_map)
         self.room_key: str = room_key
         self.players: dict[int, "Player"] = {}
         self.meta: MapMeta = meta
         self.slots: list[Point] = meta["points_of_interest"].get(CellType.SPAWN, [])
+        self.spectators = SpectatorFeed(self.watch_message)
+        self.chat = ChatChannel(self)
         self._states = {
             GameStatus.WAITING_FOR_PLAYERS: WaitingState(self),
             GameStatus.IN_PROGRESS: GameInProgressState(self),
             GameStatus.FINISHED: GameFinished(self),
         }
         self._state: GameState = self._states[GameStatus.WAITING_FOR_PLAYERS]
-        GAME_STATE.labels(room_id=room_key).set(GameStatus.WAITING_FOR_PLAYERS.value)
+        self.status = GameStatus.WAITING_FOR_PLAYERS
+
+    @classmethod
+    def restore(cls, room_key: str, snapshot: RoomSnapshot) -> "GameRoom":
+        """Rebuild a game in progress from its snapshot"""
+        room = cls(room_key, snapshot["map"], snapshot["meta"], prepared=True)
+        cast(GameInProgressState, room._states[GameStatus.IN_PROGRESS]).restore(snapshot)
+        room.transition_to(GameStatus.IN_PROGRESS)
+        return room
+
+    @property
+    def turn(self) -> int:
+        return cast(GameInProgressState, self._states[GameStatus.IN_PROGRESS]).turn
+
+    @property
+    def flight_recorder(self) -> FlightRecorder:
+        return cast(GameInProgressState, self._states[GameStatus.IN_PROGRESS]).flight_recorder
 
     @property
     def dimension(self) -> tuple[int, int]:
@@ -42,8 +64,10 @@ class GameRoom:
         return game_map
 
     def transition_to(self, new_state: GameStatus) -> None:
-        GAME_STATE.labels(room_id=self.room_key).set(new_state.value)
         self._state = self._states[new_state]
+        self.status = new_state
+        # The frame of the previous state must not reach spectators joining later
+        self.spectators.invalidate()
 
     def register_player(self, player: "Player") -> None:
         self.players[player.id] = player
@@ -54,8 +78,11 @@ class GameRoom:
         if player.id in self.players:
             del self.players[player.id]
 
-    async def broadcast(self, message: MessageType) -> None:
-        tasks = [self.send_message(player, message) for player in self.players.values()]
+    async def broadcast(
+        self, message: MessageType, players: Iterable["Player"] | None = None
+    ) -> None:
+        recipients = self.players.values() if players is None else players
+        tasks = [self.send_message(player, message) for player in recipients]
         await asyncio.gather(*tasks)
 
     async def send_message(self, player: "Player", message: MessageType) -> None:
@@ -66,6 +93,30 @@ class GameRoom:
             logger.error("Error while sending", exc_info=e, stack_info=True)
             await self.disconnect(player)
 
+    async def send_frame(self, player: "Player", frame: str) -> None:
+        try:
+            await player.send_text(frame)
+        except Exception as e:
+            logger.error("Error while sending", exc_info=e, stack_info=True)
+            await self.disconnect(player)
+
+    def watch_message(self) -> WatchMessage:
+        """Whole board and every player's stats, what spectators see"""
+        return WatchMessage(
+            at="watch",
+            map=self.game_map,
+            turn=self.turn,
+            stats=[
+                (
+                    PlayerData(
+                        id=player.id, username=player.nick, color=player.color, status=player.status
+                    ),
+                    GameStat(fields=player.territory.count(), power=player.power),
+                )
+                for player in self.players.values()
+            ],
+        )
+
     async def wait_all_ready(self, player: "Player") -> None:
         await self._state.connect(player)
 
@@ -81,12 +132,30 @@ class GameRoom:
     async def after_play(self, player: "Player") -> None:
         await self._state.after_play(player)
 
+    def finish(self) -> None:
+        self._state.finish()
+
     async def cleanup(self) -> None:
         await self._state.cleanup()
 
     async def handle_player_message(self, player: "Player", message: InMessage) -> None:
         match message["at"]:
             case "chat":
-                await self.broadcast(message)
+                if isinstance(message.get("message"), str):
+                    self.chat.post(player, message["message"])
+                return
+            case "viewport":
+                row, col = message.get("row"), message.get("col")
+                height, width = message.get("height"), message.get("width")
+                # A malformed rectangle is ignored, the player stays in the game
+                if (
+                    isinstance(row, int)
+                    and isinstance(col, int)
+                    and isinstance(height, int)
+                    and isinstance(width, int)
+                    and height > 0
+                    and width > 0
+                ):
+                    player.set_viewport(row, col, height, width)
                 return
         await self._state.handle_player_message(player, message)
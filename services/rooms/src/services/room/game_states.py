@@ -1,29 +1,49 @@
 import asyncio
+import contextlib
 import random
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
 
-from app_types.common import GameStatus
+from app_types.common import GameStatus, PlayerStatus
 from app_types.map import CellType, Point
 from app_types.messages import InMessage
-from app_types.out_messages import GameStat, PlayerData, PlayersMessage, StartMessage, UpdateMessage
+from app_types.out_messages import (
+    GameStat,
+    MinimapDict,
+    PlayerData,
+    PlayersMessage,
+    StartMessage,
+    UpdateMessage,
+)
+from app_types.room import RoomSnapshot, SnapshotPlayer
 from exceptions.room import (
     RoomInGameError,
     RoomNoSlots,
     RoomNotReadyError,
+    RoomPlayerLeft,
 )
 from logger import get_logger
-from metrics import TERRITORY_SIZE
+from metrics import GAME_DURATION, SHED_UPDATES, TERRITORY_SIZE
+from repositories.replay import replay_repo
+from services.loop_monitor import loop_monitor
 from services.player import Player
+from services.room.events import GameEvents
 from services.room.game_loop import GameLoop
+from services.room.replays import ReplayRecorder
+from services.room.snapshots import GameSnapshots
 from services.room.strategies import ClassicGameStrategy
 from settings import settings
+from stores.redis import redis_manager
+from tracing import FlightRecorder
 
 if TYPE_CHECKING:
     from services.room.game_room import GameRoom
 
 logger = get_logger(__name__)
 
+# Replay saves outlive the state that starts them, they are kept here until done
+_replay_saves: set[asyncio.Task] = set()
+
 
 class GameState(ABC):
     def __init__(self, room: "GameRoom"):
@@ -44,6 +64,9 @@ class GameState(ABC):
     def allow_reconnect(self) -> bool:
         return False
 
+    def finish(self) -> None:
+        pass
+
     @abstractmethod
     async def cleanup(self) -> None:
         pass
@@ -88,10 +111,13 @@ class WaitingState(GameState):
 
         player.start_listening()
         await self._room.broadcast(self._players_message())
+        await self._room.chat.send_history(player)
 
         async with self._game_start_condition:
             while not await self._is_all_ready():
                 await self._game_start_condition.wait()
+                if self._room.players.get(player.id) is not player:
+                    raise RoomPlayerLeft("Player left the room before the game started")
 
             if self._room.players:
                 self._room.transition_to(GameStatus.IN_PROGRESS)
@@ -102,12 +128,16 @@ class WaitingState(GameState):
 
     async def disconnect(self, player: "Player") -> None:
         async with self._lock:
+            if self._room.players.get(player.id) is not player:
+                return
             self._room.exclude_player(player)
             await self._release_color(player=player)
             await self._release_slot(player=player)
 
         await self._room.broadcast(self._players_message())
-        await self._check_all_players_ready()
+        # Wake every waiter: the one that left stops waiting, the rest may be able to start
+        async with self._game_start_condition:
+            self._game_start_condition.notify_all()
 
     async def play(self, player: "Player") -> None:
         raise RoomNotReadyError("You need to connect firstly")
@@ -180,22 +210,63 @@ class WaitingState(GameState):
 class GameInProgressState(GameState):
     def __init__(self, room: "GameRoom"):
         super().__init__(room)
-        self._game_strategy = ClassicGameStrategy(room.game_map, room.players)
+        self._replay = ReplayRecorder()
+        self._events = GameEvents(room.room_key)
+        self._game_strategy = ClassicGameStrategy(
+            room.game_map, room.players, self._replay, self._events
+        )
         self._game_strategy.set_on_turn_done(self._broadcast_state)
         self._game_strategy.set_on_game_done(self._next_state)
-        self._game_loop = GameLoop(
-            self._game_strategy,
+        self.flight_recorder = FlightRecorder(
+            room.room_key, settings.flight_recorder_turns, settings.flight_recorder_cooldown
         )
+        self._game_loop = GameLoop(self._game_strategy, self.flight_recorder)
+        self._snapshots = GameSnapshots(room, self._game_strategy.tiles, settings.snapshot_interval)
+        # Players of a game restored from a snapshot who have not rejoined yet
+        self._returning: dict[int, SnapshotPlayer] = {}
+        self._all_returned: asyncio.Event = asyncio.Event()
+        self._all_returned.set()
+
+    @property
+    def turn(self) -> int:
+        return self._game_loop.current_turn
+
+    def restore(self, snapshot: RoomSnapshot) -> None:
+        """Resume the game from a snapshot, its players take their places back on connect"""
+        self._returning = {player["id"]: player for player in snapshot["players"]}
+        if self._returning:
+            self._all_returned.clear()
+        self._game_loop.resume_from(snapshot["turn"])
+
+    def finish(self) -> None:
+        self._game_loop.finish()
 
     async def cleanup(self) -> None:
+        self._snapshots.stop()
+        self._events.stop()
         await self._game_loop.stop()
         for player in self._room.players.values():
             await player.stop_listening()
 
     async def connect(self, player: "Player") -> None:
-        raise RoomInGameError("Game's already started")
+        if player.id not in self._returning:
+            raise RoomInGameError("Game's already started")
+
+        await player.authenticate()
+        state = self._returning.pop(player.id, None)
+        if state is None:
+            raise RoomInGameError("Game's already started")
+        player.restore(state, self._room.game_map)
+        self._replay.record_join(self._game_loop.current_turn, state)
+        self._room.register_player(player)
+        player.start_listening()
+        await self._room.chat.send_history(player)
+        if not self._returning:
+            self._all_returned.set()
 
     async def disconnect(self, player: "Player") -> None:
+        if player.id in self._room.players:
+            self._replay.record_leave(self._game_loop.current_turn, player.id)
         self._room.exclude_player(player)
 
     async def handle_player_message(self, player: "Player", message: InMessage) -> None:
@@ -203,9 +274,22 @@ class GameInProgressState(GameState):
             case "move":
                 previous = Point(**message.get("previous")) if message.get("previous") else None
                 current = Point(**message.get("current")) if message.get("current") else None
+                if not (self._on_board(previous) and self._on_board(current)):
+                    # A move off the board only resets the queue, just like a blocked one
+                    previous = current = None
                 await player.move(previous, current)
 
     async def play(self, player: "Player") -> None:
+        # A restored game waits a little for everyone, absent players are left out
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._all_returned.wait(), settings.recovery_grace)
+        if not self._replay.started:
+            self._replay.start(
+                self._game_loop.current_turn,
+                self._room.game_map,
+                self._room.meta,
+                [player.snapshot() for player in self._room.players.values()],
+            )
         await self._room.broadcast(StartMessage(at="start"))
         await self._game_loop.start()
         try:
@@ -218,7 +302,6 @@ class GameInProgressState(GameState):
         raise RoomNotReadyError("Wrong state")
 
     def _update_message(self, player: "Player") -> UpdateMessage:
-        TERRITORY_SIZE.observe(player.territory.count())
         message = UpdateMessage(
             at="update",
             map=player.pov,
@@ -234,13 +317,104 @@ class GameInProgressState(GameState):
             message["cursor"] = {"row": player.cursor.row, "col": player.cursor.col}
         if player.prev_cursor:
             message["prev_cursor"] = {"row": player.prev_cursor.row, "col": player.prev_cursor.col}
+        if player.viewport:
+            row, col, height, width = player.viewport
+            message["map"] = [line[col : col + width] for line in player.pov[row : row + height]]
+            message["window"] = {"row": row, "col": col}
+            if self._game_loop.current_turn % settings.minimap_interval == 0:
+                message["minimap"] = self._minimap(player)
         return message
 
+    def _minimap(self, player: "Player") -> MinimapDict:
+        """Dominant owner of every known block of the player's POV"""
+        block = settings.minimap_block_size
+        if player.pov is self._room.game_map:
+            height, width = self._room.dimension
+            points = (Point(r, c) for r in range(height) for c in range(width))
+        else:
+            points = iter(player.visible_points)
+
+        owners: dict[tuple[int, int], dict[int, int]] = {}
+        for row, col in points:
+            owner = player.pov[row][col].get("player")
+            if owner:
+                counter = owners.setdefault((row // block, col // block), {})
+                counter[owner] = counter.get(owner, 0) + 1
+
+        cells = [
+            (r, c, max(counter, key=counter.__getitem__)) for (r, c), counter in owners.items()
+        ]
+        return MinimapDict(block=block, cells=cells)
+
     async def _broadcast_state(self) -> None:
-        await self._room.broadcast(self._update_message)
+        turn = self._game_loop.current_turn
+        self._snapshots.capture(turn)
+        playing, watching = [], []
+        for player in self._room.players.values():
+            (watching if player.status == PlayerStatus.LOSER else playing).append(player)
+        summary = [(player.id, player.territory.count(), player.power) for player in playing]
+        self._events.add("turn", turn, summary)
+        self._events.flush()
+
+        # Eliminated players only watch the whole board, like spectators they share one
+        # frame per turn and under load they see every few turns
+        spectators = self._room.spectators
+        sends = [self._room.broadcast(self._update_message, playing)]
+        shed = loop_monitor.degraded and turn % settings.shed_update_every
+        if not shed and (watching or spectators):
+            frame = spectators.publish(self._room.watch_message())
+            sends.extend(self._room.send_frame(player, frame) for player in watching)
+        else:
+            if shed:
+                SHED_UPDATES.inc(len(watching) + len(spectators))
+            spectators.invalidate()
+        await asyncio.gather(*sends)
 
     async def _next_state(self) -> None:
+        self._snapshots.stop()
+        GAME_DURATION.observe(self._game_loop.current_turn)
+        for player in self._room.players.values():
+            TERRITORY_SIZE.observe(player.territory.count())
+        self._publish_results()
+        if self._replay.started:
+            save = asyncio.create_task(self._save_replay())
+            _replay_saves.add(save)
+            save.add_done_callback(_replay_saves.discard)
         self._room.transition_to(GameStatus.FINISHED)
+        self._room.spectators.close()
+
+    def _publish_results(self) -> None:
+        players = list(self._room.players.values())
+        ready = [player for player in players if player.is_ready]
+        results = {
+            # A game stopped by a drain can end without a winner
+            "winner": ready[0].id if len(ready) == 1 else None,
+            "players": [
+                {
+                    "id": player.id,
+                    "nick": player.nick,
+                    "status": player.status,
+                    "fields": player.territory.count(),
+                }
+                for player in players
+            ],
+        }
+        self._events.add("finished", self._game_loop.current_turn, results)
+        self._events.flush()
+
+    async def _save_replay(self) -> None:
+        try:
+            replay = self._replay.dump(self._game_loop.current_turn)
+            async with redis_manager.client() as redis:
+                await replay_repo.save_replay(redis, self._room.room_key, replay)
+        except Exception as e:
+            logger.error(
+                "Replay was not saved", extra={"room_key": self._room.room_key}, exc_info=e
+            )
+
+    def _on_board(self, point: Point | None) -> bool:
+        height, width = self._room.dimension
+        return point is None or (0 <= point.row < height and 0 <= point.col < width)
 
 
 class GameFinished(GameState):
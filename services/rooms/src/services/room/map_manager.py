@@ -2,24 +2,30 @@ from itertools import chain
 
 from app_types.map import Cell, CellType, GameMap, Point
 from services.player import Player
+from services.room.tiles import DirtyTiles
 
 
 class MapManager:
-    def __init__(self, game_map: GameMap, current_turn: int):
+    def __init__(self, game_map: GameMap, current_turn: int, tiles: DirtyTiles):
         self._game_map = game_map
         self.current_turn = current_turn
+        self._tiles = tiles
         self._map_diff: dict[Point, tuple[int | None, int | None]] = {}
 
     def update_map(self, players: dict[int, "Player"]) -> None:
+        growth_turn = self.current_turn % 15 == 0
         for point in chain.from_iterable(p.hold for p in players.values()):
             cell: Cell = self._game_map[point.row][point.col]
             cell_type = cell.get("type")
             if cell_type == CellType.KING:
                 cell["power"] = cell.get("power", 0) + 1
+                self._tiles.mark(point)
             if cell_type == CellType.CASTLE and cell.get("player"):
                 cell["power"] = cell.get("power", 0) + 1
-            elif self.current_turn % 15 == 0:
+                self._tiles.mark(point)
+            elif growth_turn:
                 cell["power"] = cell.get("power", 0) + 1
+                self._tiles.mark(point)
 
     def process_move(self, player: "Player", move_points: tuple[Point, Point]) -> None:
         if not move_points:
@@ -47,6 +53,8 @@ class MapManager:
             player.reset_moves()
             return
 
+        self._tiles.mark(cursor)
+        self._tiles.mark(next_move)
         if current_cell_player == target_cell_player:
             current_cell["power"] = 1
             target_cell["power"] = target_cell_power + current_cell_power
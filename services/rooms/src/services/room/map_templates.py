@@ -0,0 +1,92 @@
+import hashlib
+import sys
+from collections import OrderedDict
+from typing import Callable
+
+from app_types.map import Cell, MapAndMeta, MapMeta
+from metrics import MAP_TEMPLATE_CACHE, MAP_TEMPLATE_CACHE_SIZE
+from settings import settings
+
+
+class MapTemplate:
+    """Parsed map shared by every room that uses it. Rooms only get copies"""
+
+    def __init__(self, map_and_meta: MapAndMeta):
+        self._rows: tuple[tuple[Cell, ...], ...] = tuple(tuple(row) for row in map_and_meta["map"])
+        self._meta: MapMeta = map_and_meta["meta"]
+        self.size = self._estimate_size()
+
+    def instantiate(self) -> MapAndMeta:
+        # Cells are mutated in place during the game, so every room needs its own dicts
+        game_map = [[cell.copy() for cell in row] for row in self._rows]
+        meta = MapMeta(
+            points_of_interest={
+                cell_type: list(points)
+                for cell_type, points in self._meta["points_of_interest"].items()
+            },
+            version=self._meta["version"],
+        )
+        return MapAndMeta(map=game_map, meta=meta)
+
+    def _estimate_size(self) -> int:
+        """Resident size of the parsed cells, the serialized blob is orders of magnitude smaller
+
+        Cell values are enum members and small ints shared by every cell, only the dicts
+        and the row tuples holding them are counted.
+        """
+        size = sys.getsizeof(self._rows)
+        for row in self._rows:
+            size += sys.getsizeof(row) + sum(sys.getsizeof(cell) for cell in row)
+        return size
+
+
+class MapTemplateCache:
+    """LRU of parsed map templates keyed by the hash of their serialized form.
+
+    It is bounded by the estimated in-memory size of the parsed templates.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._templates: OrderedDict[str, MapTemplate] = OrderedDict()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def get_or_parse(self, raw_data: bytes, parse: Callable[[bytes], MapAndMeta]) -> MapAndMeta:
+        digest = hashlib.blake2b(raw_data, digest_size=16).hexdigest()
+        template = self._templates.get(digest)
+        if template is not None:
+            MAP_TEMPLATE_CACHE.labels(result="hit").inc()
+            self._templates.move_to_end(digest)
+            return template.instantiate()
+
+        MAP_TEMPLATE_CACHE.labels(result="miss").inc()
+        template = MapTemplate(parse(raw_data))
+        self._put(digest, template)
+        return template.instantiate()
+
+    def clear(self) -> None:
+        self._templates.clear()
+        self._size = 0
+        MAP_TEMPLATE_CACHE_SIZE.set(0)
+
+    def _put(self, digest: str, template: MapTemplate) -> None:
+        if template.size > self._max_bytes:
+            return
+
+        while self._templates and self._size + template.size > self._max_bytes:
+            _, evicted = self._templates.popitem(last=False)
+            self._size -= evicted.size
+
+        self._templates[digest] = template
+        self._size += template.size
+        MAP_TEMPLATE_CACHE_SIZE.set(self._size)
+
+
+map_template_cache = MapTemplateCache(settings.map_cache_max_bytes)
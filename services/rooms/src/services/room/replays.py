@@ -0,0 +1,245 @@
+import asyncio
+import struct
+import zlib
+from itertools import groupby
+from typing import Awaitable, Callable
+
+import orjson
+
+from app_types.common import PlayerStatus
+from app_types.map import GameMap, MapMeta, Point
+from app_types.messages import InMessage
+from app_types.out_messages import GameStat, PlayerData, ReplayMessage
+from app_types.room import SnapshotPlayer
+from logger import get_logger
+from repositories.room import decode_room, encode_room
+from services.loop_monitor import loop_monitor
+from services.player import Player
+from services.room.game_loop import TURN_INTERVAL
+from services.room.strategies import ClassicGameStrategy
+
+logger = get_logger(__name__)
+
+REPLAY_FORMAT_MAGIC = b"\x00KP"
+REPLAY_FORMAT_VERSION = 1
+
+# turn, kind, player index in the roster, then source and target of a move
+REPLAY_RECORD = struct.Struct("<IBBHHHH")
+RECORD_MOVE = 0
+RECORD_LEAVE = 1
+RECORD_JOIN = 2
+_LENGTH = struct.Struct("<I")
+
+
+class ReplayRecorder:
+    """Input log of a game: the starting board, the roster and a fixed-size binary record
+    for every move taken off a player's queue, every leave and every late join.
+
+    The game is deterministic given those, so the log is enough to play it again.
+    """
+
+    def __init__(self) -> None:
+        self._initial: bytes | None = None
+        self._start_turn = 0
+        self._roster: list[SnapshotPlayer] = []
+        self._indices: dict[int, int] = {}
+        self._log = bytearray()
+
+    @property
+    def started(self) -> bool:
+        return self._initial is not None
+
+    def start(
+        self, turn: int, game_map: GameMap, meta: MapMeta, players: list[SnapshotPlayer]
+    ) -> None:
+        self._initial = encode_room({"map": game_map, "meta": meta})
+        self._start_turn = turn
+        for player in players:
+            self._add(player)
+
+    def record_move(self, turn: int, player_id: int, move: tuple[Point, Point]) -> None:
+        index = self._indices.get(player_id)
+        if index is not None:
+            (row, col), (next_row, next_col) = move
+            self._log += REPLAY_RECORD.pack(turn, RECORD_MOVE, index, row, col, next_row, next_col)
+
+    def record_leave(self, turn: int, player_id: int) -> None:
+        index = self._indices.get(player_id)
+        if index is not None:
+            self._log += REPLAY_RECORD.pack(turn, RECORD_LEAVE, index, 0, 0, 0, 0)
+
+    def record_join(self, turn: int, player: SnapshotPlayer) -> None:
+        if self.started:
+            index = self._add(player)
+            self._log += REPLAY_RECORD.pack(turn, RECORD_JOIN, index, 0, 0, 0, 0)
+
+    def dump(self, last_turn: int) -> bytes:
+        """Encode the replay: magic, version byte, then a zlib-compressed body of the
+        length-prefixed header and starting board followed by the records"""
+        if self._initial is None:
+            raise ValueError("Nothing was recorded")
+
+        header = orjson.dumps(
+            {
+                "turn": self._start_turn,
+                "last_turn": last_turn,
+                "players": [
+                    {
+                        "id": player["id"],
+                        "nick": player["nick"],
+                        "color": player["color"],
+                        "status": player["status"],
+                        "init": list(player["init_point"]),
+                    }
+                    for player in self._roster
+                ],
+            }
+        )
+        body = b"".join(
+            (
+                _LENGTH.pack(len(header)),
+                header,
+                _LENGTH.pack(len(self._initial)),
+                self._initial,
+                self._log,
+            )
+        )
+        return REPLAY_FORMAT_MAGIC + bytes((REPLAY_FORMAT_VERSION,)) + zlib.compress(body, 6)
+
+    def _add(self, player: SnapshotPlayer) -> int:
+        self._indices[player["id"]] = len(self._roster)
+        self._roster.append(player)
+        return self._indices[player["id"]]
+
+
+class ReplayPlayer(Player):
+    """Player of a replayed game, its moves come from the log"""
+
+    async def authenticate(self) -> bool:
+        return True
+
+    async def receive_json(self) -> InMessage:
+        # Nothing is ever received, a receive loop just waits here until it is stopped
+        await asyncio.Event().wait()
+        raise RuntimeError("Replay players receive nothing")
+
+    async def send_json(self, message) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        pass
+
+    async def close(self, code: int, reason: str) -> None:
+        pass
+
+
+OnFrameType = Callable[[ReplayMessage], Awaitable[None]]
+
+
+class GameReplay:
+    """Plays a recorded game again with the regular game strategy.
+
+    Without a frame callback and speed it runs as fast as it can, which makes stored
+    replays reproducible benchmark inputs for the turn code.
+    """
+
+    def __init__(self, raw_data: bytes):
+        if not raw_data.startswith(REPLAY_FORMAT_MAGIC):
+            raise ValueError("Not a replay")
+        version = raw_data[len(REPLAY_FORMAT_MAGIC)]
+        if version != REPLAY_FORMAT_VERSION:
+            raise ValueError(f"Unsupported replay format version {version}")
+
+        body = zlib.decompress(raw_data[len(REPLAY_FORMAT_MAGIC) + 1 :])
+        (header_size,) = _LENGTH.unpack_from(body)
+        offset = _LENGTH.size
+        header = orjson.loads(body[offset : offset + header_size])
+        offset += header_size
+        (initial_size,) = _LENGTH.unpack_from(body, offset)
+        offset += _LENGTH.size
+        self._initial = body[offset : offset + initial_size]
+        records = REPLAY_RECORD.iter_unpack(body[offset + initial_size :])
+
+        self.start_turn: int = header["turn"]
+        self.last_turn: int = header["last_turn"]
+        self._roster = [
+            SnapshotPlayer(
+                id=player["id"],
+                nick=player["nick"],
+                color=player["color"],
+                status=PlayerStatus(player["status"]),
+                init_point=Point(*player["init"]),
+            )
+            for player in header["players"]
+        ]
+        self._records = {turn: list(group) for turn, group in groupby(records, lambda r: r[0])}
+
+    async def run(self, on_frame: OnFrameType | None = None, speed: float | None = None) -> int:
+        """Play the game turn by turn, sending a frame after each one
+
+        Returns:
+            int: Number of turns played
+        """
+        map_and_meta = decode_room(self._initial)
+        game_map = map_and_meta["map"]
+        players: dict[int, Player] = {}
+        late = {index for _, kind, index, *_ in self._iter_records() if kind == RECORD_JOIN}
+        for index, state in enumerate(self._roster):
+            if index not in late:
+                self._join(players, state, game_map)
+
+        strategy = ClassicGameStrategy(game_map, players)
+        self._apply_events(self.start_turn, players, game_map)
+        for turn in range(self.start_turn + 1, self.last_turn + 1):
+            await strategy.init_turn(turn)
+            for _, kind, index, row, col, next_row, next_col in self._records.get(turn, ()):
+                player = players.get(self._roster[index]["id"])
+                if kind == RECORD_MOVE and player is not None:
+                    player.moves.put_nowait((Point(row, col), Point(next_row, next_col)))
+            strategy.make_turn()
+            if on_frame is not None:
+                await on_frame(self._frame(turn, game_map, players))
+            self._apply_events(turn, players, game_map)
+            # Replays share the event loop with live games, they yield after every turn
+            # and slow down to real time while the loop lags
+            if not speed:
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(
+                    TURN_INTERVAL if loop_monitor.degraded else TURN_INTERVAL / speed
+                )
+
+        return self.last_turn - self.start_turn
+
+    def _iter_records(self):
+        for group in self._records.values():
+            yield from group
+
+    def _apply_events(self, turn: int, players: dict[int, Player], game_map: GameMap) -> None:
+        for _, kind, index, *_ in self._records.get(turn, ()):
+            state = self._roster[index]
+            if kind == RECORD_LEAVE:
+                players.pop(state["id"], None)
+            elif kind == RECORD_JOIN:
+                self._join(players, state, game_map)
+
+    def _join(self, players: dict[int, Player], state: SnapshotPlayer, game_map: GameMap) -> None:
+        player = ReplayPlayer(state["id"], state["nick"], (len(game_map), len(game_map[0])))
+        player.restore(state, game_map)
+        players[player.id] = player
+
+    def _frame(self, turn: int, game_map: GameMap, players: dict[int, Player]) -> ReplayMessage:
+        return ReplayMessage(
+            at="replay",
+            turn=turn,
+            map=game_map,
+            stats=[
+                (
+                    PlayerData(
+                        id=player.id, username=player.nick, color=player.color, status=player.status
+                    ),
+                    GameStat(fields=player.territory.count(), power=player.power),
+                )
+                for player in players.values()
+            ],
+        )
@@ -1,16 +1,24 @@
+import asyncio
+from functools import partial
 from typing import Optional
 
 from redis.asyncio import Redis
 
+from app_types.common import GameStatus
 from app_types.map import CellType, MapAndMeta
 from exceptions.room import (
+    RoomNoSlots,
     RoomNotFoundError,
     RoomWrongReplica,
 )
 from logger import get_logger
-from repositories.room import lobby_repo, room_repo, sharding_repo
+from metrics import PLAYERS, ROOMS, SPECTATORS
+from repositories.replica import replica_repo
+from repositories.room import lobby_repo, room_repo, sharding_repo, snapshot_repo
+from services.loop_monitor import loop_monitor
 from services.player import Player
 from services.room.game_room import GameRoom
+from services.room.map_templates import map_template_cache
 from settings import settings
 
 logger = get_logger(__name__)
@@ -20,40 +28,112 @@ logger = get_logger(__name__)
 class RoomManager:
     def __init__(self) -> None:
         self.rooms: dict[str, "GameRoom"] = {}
+        self.draining = False
+        self._handed_off: set[str] = set()
+        for status in GameStatus:
+            state = status.name.lower()
+            ROOMS.labels(state=state).set_function(partial(self.count_rooms, status))
+            PLAYERS.labels(state=state).set_function(partial(self.count_players, status))
+        SPECTATORS.set_function(self.count_spectators)
+
+    def count_rooms(self, status: GameStatus) -> int:
+        return sum(room.status == status for room in self.rooms.values())
+
+    def count_players(self, status: GameStatus) -> int:
+        return sum(len(room.players) for room in self.rooms.values() if room.status == status)
+
+    def count_spectators(self) -> int:
+        return sum(len(room.spectators) for room in self.rooms.values())
 
     async def save_room(self, redis: Redis, map_and_meta: MapAndMeta) -> str:
         room_key = await room_repo.save_room(redis, map_and_meta)
+        max_players = len(map_and_meta["meta"]["points_of_interest"][CellType.SPAWN])
+        await lobby_repo.prepare_room(redis, max_players, room_key)
+        replica = await replica_repo.pick_replica(redis)
+        if replica:
+            await sharding_repo.assign_room(redis, room_key, replica)
         return room_key
 
+    def is_handed_off(self, room_key: str) -> bool:
+        return room_key in self._handed_off
+
+    async def locate_room(self, redis: Redis, room_key: str) -> str | None:
+        return await sharding_repo.get_room_replica(redis, room_key)
+
     async def get_or_create_room(self, redis: Redis, room_key: str) -> "GameRoom":
-        replica = await sharding_repo.get_room_replica(redis, room_key)
-        if replica and replica != settings.replica_id:
-            raise RoomWrongReplica()
+        if room_key in self.rooms and room_key not in self._handed_off:
+            return self.rooms[room_key]
 
+        if self.draining or loop_monitor.shedding:
+            # A room already placed elsewhere only needs a redirect, a placement is paid once
+            owner = await sharding_repo.get_room_replica(redis, room_key)
+            if owner and owner != settings.replica_id:
+                raise RoomWrongReplica(owner)
+            replica = await self._pick_other_replica(redis)
+            if replica:
+                raise RoomWrongReplica(await sharding_repo.hand_off_room(redis, room_key, replica))
+
+        claim = await sharding_repo.claim_room(redis, room_key)
+        if claim.replica != settings.replica_id:
+            raise RoomWrongReplica(claim.replica)
+        if claim.raw_room is None:
+            return await self._recover_room(redis, room_key)
         if room_key in self.rooms:
+            # Another connection created the room while this one was claiming it
             return self.rooms[room_key]
 
-        map_and_meta = await room_repo.load_room(redis, room_key)
-        if not map_and_meta:
-            raise RoomNotFoundError()
-
+        map_and_meta = map_template_cache.get_or_parse(claim.raw_room, room_repo.parse_room)
         game_map, meta = map_and_meta["map"], map_and_meta["meta"]
         game_room = GameRoom(room_key, game_map, meta)
         self.rooms[room_key] = game_room
-        await sharding_repo.set_room_replica(redis, room_key)
-        await lobby_repo.add_room(redis, len(meta["points_of_interest"][CellType.SPAWN]), room_key)
+        if not claim.listed:
+            # Rooms saved before lobby data was prepared on creation
+            max_players = len(meta["points_of_interest"][CellType.SPAWN])
+            await lobby_repo.add_room(redis, max_players, room_key)
+        return game_room
+
+    async def get_room_to_watch(self, redis: Redis, room_key: str) -> "GameRoom":
+        """Room hosted here for a spectator, who neither claims nor creates one"""
+        room = self.rooms.get(room_key)
+        if room is not None and room_key not in self._handed_off:
+            if len(room.spectators) >= settings.max_spectators:
+                raise RoomNoSlots()
+            return room
+
+        replica = await sharding_repo.get_room_replica(redis, room_key)
+        if replica and replica != settings.replica_id:
+            raise RoomWrongReplica(replica)
+        raise RoomNotFoundError()
+
+    async def _recover_room(self, redis: Redis, room_key: str) -> "GameRoom":
+        """Resume a game lost with its replica from the latest snapshot"""
+        snapshot = await snapshot_repo.load_snapshot(redis, room_key)
+        if snapshot is None:
+            raise RoomNotFoundError()
+        if room_key in self.rooms:
+            return self.rooms[room_key]
+
+        game_room = GameRoom.restore(room_key, snapshot)
+        self.rooms[room_key] = game_room
+        logger.info("Room recovered", extra={"room_key": room_key, "turn": snapshot["turn"]})
         return game_room
 
     async def play_with_room(self, redis: Redis, room: "GameRoom", player: "Player") -> None:
-        await lobby_repo.add_players(redis, room.room_key)
+        reserved = await lobby_repo.join_room(redis, room.room_key)
+        if not reserved and room.status == GameStatus.WAITING_FOR_PLAYERS:
+            # Full, or left the lobby already: only returning players join a started game
+            raise RoomNoSlots()
 
         try:
             await room.wait_all_ready(player)
-        except Exception as e:
-            await lobby_repo.remove_player(redis, room.room_key)
-            raise e
-        else:
-            await lobby_repo.remove_room(redis, room.room_key)
+        except BaseException:
+            if reserved:
+                await lobby_repo.leave_room(redis, room.room_key)
+            raise
+
+        if await lobby_repo.start_room(redis, room.room_key):
+            # The game lives in memory from now on, so the stored blob is no longer needed
+            await room_repo.remove_room(redis, room.room_key)
 
         await room.play(player)
         await room.after_play(player)
@@ -61,12 +141,6 @@ class RoomManager:
     async def cleanup(
         self, redis: Redis, room: Optional["GameRoom"], player: Optional["Player"]
     ) -> None:
-        if room:
-            try:
-                await lobby_repo.remove_player(redis, room.room_key)
-            except Exception as e:
-                logger.error("Error while removing player from lobby", exc_info=e, stack_info=True)
-
         if player:
             try:
                 await player.stop_listening()
@@ -76,9 +150,21 @@ class RoomManager:
         if player and room:
             await room.disconnect(player)
 
+        if room and room.room_key in self._handed_off:
+            # Another replica serves the room now, only the local copy goes away
+            if not room.players:
+                room.spectators.close()
+                self.rooms.pop(room.room_key, None)
+            return
+
+        if room and room.status == GameStatus.IN_PROGRESS and room.players:
+            # The game goes on for the rest, its snapshot and owner must stay for recovery
+            return
+
         if room and (not room.allow_reconnect() or len(room.players.values()) == 0):
             try:
                 await room_repo.remove_room(redis, room.room_key)
+                await snapshot_repo.remove_snapshot(redis, room.room_key)
                 await sharding_repo.remove_room_replica(redis, room.room_key)
                 await lobby_repo.remove_room(redis, room.room_key)
             except Exception as e:
@@ -86,12 +172,55 @@ class RoomManager:
                 pass
 
             try:
-                room.cleanup()
+                await room.cleanup()
             except Exception as e:
                 pass
 
+            room.spectators.close()
             if room.room_key in self.rooms:
                 del self.rooms[room.room_key]
 
+    async def drain(self, redis: Redis, timeout: float) -> None:
+        """Hand waiting rooms off to other replicas and let running games finish
+
+        Args:
+            redis: Redis client
+            timeout: Seconds to wait for running games before stopping them
+        """
+        self.draining = True
+        for room in list(self.rooms.values()):
+            if room.status == GameStatus.WAITING_FOR_PLAYERS:
+                await self._hand_off(redis, room)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline and any(
+            room.status == GameStatus.IN_PROGRESS for room in self.rooms.values()
+        ):
+            await asyncio.sleep(1)
+
+        # Games still running at the deadline end after their current turn
+        for room in self.rooms.values():
+            if room.status == GameStatus.IN_PROGRESS:
+                logger.warning("Game stopped by drain", extra={"room_key": room.room_key})
+                room.finish()
+
+    async def _hand_off(self, redis: Redis, room: "GameRoom") -> None:
+        replica = await self._pick_other_replica(redis)
+        if replica is None:
+            return
+
+        owner = await sharding_repo.hand_off_room(redis, room.room_key, replica)
+        self._handed_off.add(room.room_key)
+        room.spectators.close()
+        logger.info("Room handed off", extra={"room_key": room.room_key, "replica": owner})
+        # Players rejoin through the new owner, their lobby slots are released on disconnect
+        for player in list(room.players.values()):
+            await player.close(code=1008, reason=f"Wrong replica: {owner}")
+
+    async def _pick_other_replica(self, redis: Redis) -> str | None:
+        replica = await replica_repo.pick_replica(redis)
+        return replica if replica != settings.replica_id else None
+
 
 room_manager = RoomManager()
@@ -0,0 +1,65 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+from logger import get_logger
+from repositories.room import encode_snapshot_meta, encode_snapshot_tile, snapshot_repo
+from services.room.tiles import DirtyTiles
+from stores.redis import redis_manager
+
+if TYPE_CHECKING:
+    from services.room.game_room import GameRoom
+
+logger = get_logger(__name__)
+
+# Writes are cancelled by stop(), until then they are kept here
+_snapshot_writes: set[asyncio.Task] = set()
+
+
+class GameSnapshots:
+    """Writes a snapshot of a running game every few turns, off the turn path.
+
+    Only tiles changed since the previous write are encoded, so a snapshot costs as much
+    as the board activity between two of them rather than the map size. While a write
+    is still in flight the next snapshot is skipped and its changes go with a later one.
+    """
+
+    def __init__(self, room: "GameRoom", tiles: DirtyTiles, interval: int):
+        self._room = room
+        self._tiles = tiles
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+        self._stopped = False
+
+    def capture(self, turn: int) -> None:
+        if self._stopped or turn % self._interval:
+            return
+        if self._task is not None and not self._task.done():
+            return
+
+        game_map = self._room.game_map
+        tiles = {
+            index: encode_snapshot_tile(game_map, self._tiles.tile_bounds(index))
+            for index in self._tiles.take_unsaved()
+        }
+        players = [player.snapshot() for player in self._room.players.values()]
+        meta_data = encode_snapshot_meta(turn, self._room.meta, players)
+        self._task = asyncio.create_task(self._write(meta_data, tiles))
+        _snapshot_writes.add(self._task)
+        self._task.add_done_callback(_snapshot_writes.discard)
+
+    def stop(self) -> None:
+        self._stopped = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def _write(self, meta_data: bytes, tiles: dict[int, bytes]) -> None:
+        try:
+            async with redis_manager.client() as redis:
+                await snapshot_repo.save_snapshot(
+                    redis, self._room.room_key, self._room.dimension, meta_data, tiles
+                )
+        except Exception as e:
+            logger.error(
+                "Snapshot write failed", extra={"room_key": self._room.room_key}, exc_info=e
+            )
+            self._tiles.mark_unsaved(tiles)
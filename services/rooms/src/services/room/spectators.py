@@ -0,0 +1,90 @@
+import asyncio
+from typing import Awaitable, Callable
+
+import orjson
+
+from app_types.out_messages import WatchMessage
+
+SendTextType = Callable[[str], Awaitable[None]]
+
+
+class Spectator:
+    """Read-only viewer of a room, it is sent the latest frame and never a backlog"""
+
+    def __init__(self, send: SendTextType):
+        self._send = send
+        self._frame: str | None = None
+        self._closed = False
+        self._wakeup = asyncio.Event()
+
+    def offer(self, frame: str) -> None:
+        self._frame = frame
+        self._wakeup.set()
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            frame, self._frame = self._frame, None
+            if frame is not None:
+                await self._send(frame)
+            if self._closed:
+                return
+
+
+class SpectatorFeed:
+    """Full-board frames of a room, each encoded once and shared by all spectators.
+
+    Publishing only hands the encoded frame to every spectator, sending runs in their own
+    connection handlers. A slow spectator skips the frames it had no time for instead of
+    holding the others or the turn back.
+    """
+
+    def __init__(self, snapshot: Callable[[], WatchMessage]):
+        self._snapshot = snapshot
+        self._spectators: set[Spectator] = set()
+        self._frame: str | None = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._spectators)
+
+    def publish(self, message: WatchMessage) -> str:
+        """Encode the frame of a turn and offer it to every spectator
+
+        Returns:
+            str: The encoded frame, for players who are only watching too
+        """
+        self._frame = orjson.dumps(message).decode()
+        for spectator in self._spectators:
+            spectator.offer(self._frame)
+        return self._frame
+
+    def invalidate(self) -> None:
+        """Forget the last frame after a turn nobody watched, late joiners get a fresh one"""
+        self._frame = None
+
+    def close(self) -> None:
+        self._closed = True
+        self._frame = None
+        for spectator in self._spectators:
+            spectator.close()
+
+    async def watch(self, send: SendTextType) -> None:
+        """Send frames until the feed is closed, the first one right away"""
+        if self._closed:
+            return
+
+        spectator = Spectator(send)
+        if self._frame is None:
+            self._frame = orjson.dumps(self._snapshot()).decode()
+        spectator.offer(self._frame)
+        self._spectators.add(spectator)
+        try:
+            await spectator.run()
+        finally:
+            self._spectators.discard(spectator)
@@ -1,14 +1,23 @@
 from abc import ABC, abstractmethod
-from typing import Awaitable, Callable, Optional
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+from bitarray import bitarray
 
 from app_types.common import PlayerStatus
 from app_types.map import GameMap
-from metrics import TURN_DURATION
+from metrics import TURN_DURATION_BY_OPERATION
 from services.player import Player
 from services.room.map_manager import MapManager
 from services.room.territory_manager import TerritoryManager
+from services.room.tiles import DirtyTiles
+from settings import settings
+from tracing import trace_count
 from utils import measure_time
 
+if TYPE_CHECKING:
+    from services.room.events import GameEvents
+    from services.room.replays import ReplayRecorder
+
 
 class GameLoopStrategy(ABC):
     """Интерфейс стратегии для игрового цикла"""
@@ -52,45 +61,70 @@ class GameLoopStrategy(ABC):
 class ClassicGameStrategy(GameLoopStrategy):
     """Стратегия для классической версии игры"""
 
-    def __init__(self, game_map: GameMap, players: dict[int, Player]):
+    def __init__(
+        self,
+        game_map: GameMap,
+        players: dict[int, Player],
+        recorder: Optional["ReplayRecorder"] = None,
+        events: Optional["GameEvents"] = None,
+    ):
         self._game_map = game_map
         self._players = players
-        self._map_manager = MapManager(game_map, 0)
-        self._territory_manager = TerritoryManager(game_map)
+        self._recorder = recorder
+        self._events = events
+        self._tiles = DirtyTiles(len(game_map[0]), len(game_map), settings.tile_size)
+        self._map_manager = MapManager(game_map, 0, self._tiles)
+        self._territory_manager = TerritoryManager(game_map, self._tiles)
+
+    @property
+    def tiles(self) -> DirtyTiles:
+        return self._tiles
 
     async def init_turn(self, turn_number: int) -> None:
         self._map_manager.current_turn = turn_number
 
     def make_turn(self) -> None:
-        with measure_time(TURN_DURATION, {"operation": "update_map"}):
+        with measure_time(TURN_DURATION_BY_OPERATION["update_map"], span="update_map"):
             self._map_manager.update_map(self._players)
 
-        with measure_time(TURN_DURATION, {"operation": "process_moves"}):
+        with measure_time(TURN_DURATION_BY_OPERATION["process_moves"], span="process_moves"):
             for player in self._players.values():
                 move_points = player.get_move_points()
                 if move_points:
+                    if self._recorder:
+                        self._recorder.record_move(
+                            self._map_manager.current_turn, player.id, move_points
+                        )
                     player.prev_cursor, player.cursor = move_points
+                    trace_count("moves")
                     self._map_manager.process_move(player, move_points)
 
-        with measure_time(TURN_DURATION, {"operation": "update_hold"}):
-            self._territory_manager.update_territories(
-                self._players, self._map_manager.get_map_diff()
-            )
+        with measure_time(TURN_DURATION_BY_OPERATION["update_hold"], span="update_hold"):
+            map_diff = self._map_manager.get_map_diff()
+            trace_count("captures", len(map_diff))
+            eliminated = self._territory_manager.update_territories(self._players, map_diff)
+            if self._events:
+                turn = self._map_manager.current_turn
+                self._events.captures(turn, map_diff)
+                for player_id, by in eliminated:
+                    self._events.add("eliminated", turn, {"player": player_id, "by": by})
             self._map_manager.check_cursor(self._players)
             self._map_manager.clear_map_diff()
 
-        with measure_time(TURN_DURATION, {"operation": "update_pov"}):
+        with measure_time(TURN_DURATION_BY_OPERATION["update_pov"], span="update_pov"):
+            dirty_mask = self._tiles.cells_mask()
             for player in self._players.values():
-                self._update_pov(player)
+                self._update_pov(player, dirty_mask)
+            self._tiles.clear()
 
     async def finish_turn(self) -> None:
-        with measure_time(TURN_DURATION, {"operation": "finish_turn"}):
+        with measure_time(TURN_DURATION_BY_OPERATION["finish_turn"], span="finish_turn"):
             await super().finish_turn()
 
     def is_game_done(self) -> bool:
         return sum(player.is_ready for player in self._players.values()) == 1
 
-    def _update_pov(self, player: Player) -> None:
+    def _update_pov(self, player: Player, dirty_mask: bitarray) -> None:
         if player._status == PlayerStatus.LOSER or self.is_game_done():
             player.pov = self._game_map
             return
@@ -106,7 +140,7 @@ class ClassicGameStrategy(GameLoopStrategy):
             if "power" in pov_cell:
                 del pov_cell["power"]
 
-        for point in player.visible_points:
+        for point in player.visibility.refresh_points(dirty_mask):
             r, c = point
             map_cell = self._game_map[r][c]
             pov_cell = player.pov[r][c]
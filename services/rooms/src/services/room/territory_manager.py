@@ -1,23 +1,32 @@
 from collections import defaultdict
 
+from app_types.common import PlayerStatus
 from app_types.map import GameMap, Point
 from services.player import Player
+from services.room.tiles import DirtyTiles
+from tracing import trace_count
 
 
 class TerritoryManager:
-    def __init__(self, game_map: GameMap):
+    def __init__(self, game_map: GameMap, tiles: DirtyTiles):
         self._game_map = game_map
+        self._tiles = tiles
+        self._map_width = len(game_map[0])
 
     def update_territories(
         self, players: dict[int, "Player"], map_diff: dict[Point, tuple[int | None, int | None]]
-    ) -> None:
+    ) -> list[tuple[int, int]]:
+        """Apply the turn's captures, returns ids of eliminated players and their captors"""
         territory_updates = defaultdict(list)
         territory_removals = defaultdict(list)
 
         for point, (old_player, new_player) in map_diff.items():
             if new_player:
                 territory_updates[new_player].append(point)
-            if old_player and point in players[old_player].hold:
+            # Cells of a player who is away keep their owner id, the territory of a
+            # returning player is rebuilt from the board
+            old_owner = players.get(old_player) if old_player else None
+            if old_owner and old_owner.territory.contains(point):
                 territory_removals[old_player].append(point)
 
         for player_id, points in territory_updates.items():
@@ -31,6 +40,9 @@ class TerritoryManager:
 
         captured_kingdoms: list[tuple[int, "Player"]] = []
         for player in players.values():
+            if player.status == PlayerStatus.LOSER:
+                continue
+
             row, col = player.init_point
             current_king = self._game_map[row][col].get("player")
 
@@ -41,7 +53,17 @@ class TerritoryManager:
                 captured_kingdoms.append((current_king, player))
 
         for new_king_id, captured_player in captured_kingdoms:
-            points_to_update = captured_player.hold
-            for point in points_to_update:
-                self._game_map[point.row][point.col]["player"] = new_king_id
-            players[new_king_id].takeover_kingdom(captured_player)
+            self._takeover(players[new_king_id], captured_player)
+        return [(player.id, new_king_id) for new_king_id, player in captured_kingdoms]
+
+    def _takeover(self, new_king: "Player", captured_player: "Player") -> None:
+        """Hand the captured mask over: owners, dirty tiles, then masks, counts and visibility"""
+        captured = captured_player.territory.mask
+        trace_count("takeover_cells", captured_player.territory.count())
+        # The board is a grid of cell dicts, owners can only be rewritten cell by cell
+        game_map, width = self._game_map, self._map_width
+        for index in captured.search(1):
+            row, col = divmod(index, width)
+            game_map[row][col]["player"] = new_king.id
+        self._tiles.mark_mask(captured)
+        new_king.takeover_kingdom(captured_player)
@@ -0,0 +1,107 @@
+from typing import Iterable
+
+from bitarray import bitarray
+
+from app_types.map import Point
+
+
+class DirtyTiles:
+    """Board split into fixed square tiles with a dirty bit per tile.
+
+    Dirty bits are reset every turn, but also add up into an unsaved set that is only
+    reset when a snapshot takes it.
+    """
+
+    def __init__(self, map_width: int, map_height: int, tile_size: int):
+        self._map_width = map_width
+        self._map_height = map_height
+        self._tile_size = tile_size
+        self._tiles_per_row = -(-map_width // tile_size)
+        self._tiles_per_col = -(-map_height // tile_size)
+        self._dirty = bitarray(self._tiles_per_row * self._tiles_per_col)
+        self._dirty.setall(1)
+        self._unsaved = bitarray(self._dirty)
+        self._cached_mask: bitarray | None = None
+
+    @property
+    def tile_size(self) -> int:
+        return self._tile_size
+
+    def tile_index(self, row: int, col: int) -> int:
+        return (row // self._tile_size) * self._tiles_per_row + col // self._tile_size
+
+    def tile_bounds(self, index: int) -> tuple[int, int, int, int]:
+        """Return (top, left, bottom, right) of a tile, bottom/right exclusive"""
+        top = (index // self._tiles_per_row) * self._tile_size
+        left = (index % self._tiles_per_row) * self._tile_size
+        bottom = min(top + self._tile_size, self._map_height)
+        right = min(left + self._tile_size, self._map_width)
+        return top, left, bottom, right
+
+    def mark(self, point: Point) -> None:
+        self.mark_cell(point.row, point.col)
+
+    def mark_cell(self, row: int, col: int) -> None:
+        self._dirty[self.tile_index(row, col)] = 1
+        self._cached_mask = None
+
+    def mark_mask(self, cells: bitarray) -> None:
+        """Mark every tile holding a set cell of a row-major cell mask
+
+        Rows of each band of tiles are folded into one row mask, so the work is per row and
+        per tile, not per set cell.
+        """
+        width, size = self._map_width, self._tile_size
+        for band in range(self._tiles_per_col):
+            top = band * size
+            bottom = min(top + size, self._map_height)
+            folded = cells[top * width : (top + 1) * width]
+            for row in range(top + 1, bottom):
+                folded |= cells[row * width : (row + 1) * width]
+            if not folded.any():
+                continue
+            for column in range(self._tiles_per_row):
+                if folded[column * size : (column + 1) * size].any():
+                    self._dirty[band * self._tiles_per_row + column] = 1
+        self._cached_mask = None
+
+    def mark_all(self) -> None:
+        self._dirty.setall(1)
+        self._cached_mask = None
+
+    def is_dirty(self, index: int) -> bool:
+        return bool(self._dirty[index])
+
+    def dirty_tiles(self) -> tuple[int, ...]:
+        return tuple(self._dirty.search(1))
+
+    def has_dirty(self) -> bool:
+        return self._dirty.any()
+
+    def cells_mask(self) -> bitarray:
+        """Cell-level mask (row-major, like territory masks) covering every dirty tile"""
+        if self._cached_mask is None:
+            mask = bitarray(self._map_width * self._map_height)
+            mask.setall(0)
+            for index in self._dirty.search(1):
+                top, left, bottom, right = self.tile_bounds(index)
+                for row in range(top, bottom):
+                    offset = row * self._map_width
+                    mask[offset + left : offset + right] = 1
+            self._cached_mask = mask
+        return self._cached_mask
+
+    def take_unsaved(self) -> tuple[int, ...]:
+        """Return tiles changed since the previous call and start collecting anew"""
+        unsaved = tuple(self._unsaved.search(1))
+        self._unsaved.setall(0)
+        return unsaved
+
+    def mark_unsaved(self, indices: Iterable[int]) -> None:
+        for index in indices:
+            self._unsaved[index] = 1
+
+    def clear(self) -> None:
+        self._unsaved |= self._dirty
+        self._dirty.setall(0)
+        self._cached_mask = None
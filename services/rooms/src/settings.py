@@ -15,6 +15,48 @@ class AppSettings(BaseSettings):
     default_castle_power: int = Field(default=12)
     colors_count: int = Field(default=6)
     replica_id: str = socket.gethostname()
+    viewport_margin: int = Field(default=2)
+    viewport_max_size: int = Field(default=64)
+    minimap_block_size: int = Field(default=8)
+    minimap_interval: int = Field(default=5)
+    tile_size: int = Field(default=16)
+    map_cache_max_bytes: int = Field(default=32 * 1024 * 1024)
+    room_compress_min_bytes: int = Field(default=1024)
+    lobby_snapshot_ttl: float = Field(default=1.0)
+    lobby_feed_queue_size: int = Field(default=64)
+    heartbeat_interval: float = Field(default=2.0)
+    heartbeat_timeout: float = Field(default=10.0)
+    sweep_interval: float = Field(default=30.0)
+    sweep_batch_size: int = Field(default=100)
+    drain_timeout: float = Field(default=240.0)
+    snapshot_interval: int = Field(default=10)
+    recovery_grace: float = Field(default=20.0)
+    replay_ttl: int = Field(default=7 * 86400)
+    replay_max_speed: float = Field(default=16.0)
+    debug_token: str = Field(default="")
+    profiler_interval: float = Field(default=0.005)
+    profiler_keep: int = Field(default=5)
+    turn_budget: float = Field(default=0.5)
+    profile_on_overrun: bool = Field(default=False)
+    profile_overrun_seconds: float = Field(default=5.0)
+    profile_cooldown: float = Field(default=300.0)
+    flight_recorder_turns: int = Field(default=50)
+    flight_recorder_dir: str = Field(default="/tmp/flight-recorder")
+    flight_recorder_cooldown: float = Field(default=60.0)
+    loop_lag_interval: float = Field(default=0.05)
+    loop_lag_window: float = Field(default=5.0)
+    loop_lag_degraded: float = Field(default=0.1)
+    loop_lag_shed: float = Field(default=0.25)
+    shed_update_every: int = Field(default=4)
+    max_spectators: int = Field(default=1000)
+    event_stream_maxlen: int = Field(default=1000)
+    event_results_maxlen: int = Field(default=10000)
+    event_buffer_size: int = Field(default=1000)
+    chat_batch_window: float = Field(default=0.2)
+    chat_history_size: int = Field(default=50)
+    chat_rate: float = Field(default=1.0)
+    chat_burst: int = Field(default=5)
+    chat_max_length: int = Field(default=500)
 
     model_config = SettingsConfigDict(env_prefix="rooms_")
 
@@ -3,6 +3,7 @@ from typing import AsyncIterator
 
 import redis.asyncio as redis
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
 
 from settings import settings
 
@@ -26,5 +27,9 @@ class RedisManager:
         finally:
             await client.aclose()
 
+    def register_script(self, source: str) -> AsyncScript:
+        """Lua script run by SHA on the client passed to each call, loaded on first use"""
+        return redis.Redis(connection_pool=self.redis_pool).register_script(source)
+
 
 redis_manager = RedisManager()
@@ -0,0 +1,14 @@
+import pytest_asyncio
+from dotenv import load_dotenv
+from fakeredis import FakeAsyncRedis
+
+load_dotenv(dotenv_path="src/tests/.env.test")
+
+
+@pytest_asyncio.fixture(scope="function")
+async def redis():
+    # Lua scripts run on fakeredis through lupa, see the fakeredis[lua] extra
+    client = FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.flushall()
+    await client.aclose()
@@ -0,0 +1,85 @@
+import random
+
+from bitarray import bitarray
+
+from app_types.map import Point
+from services.player import Territory, Visibility
+from services.room.tiles import DirtyTiles
+
+
+def random_mask(width: int, height: int, cells: int, rnd: random.Random) -> bitarray:
+    mask = bitarray(width * height)
+    mask.setall(0)
+    for _ in range(cells):
+        mask[rnd.randrange(width * height)] = 1
+    return mask
+
+
+def neighbourhood(mask: bitarray, width: int, height: int) -> set[Point]:
+    points = set()
+    for index in mask.search(1):
+        row, col = divmod(index, width)
+        for r in range(max(row - 1, 0), min(row + 2, height)):
+            for c in range(max(col - 1, 0), min(col + 2, width)):
+                points.add(Point(r, c))
+    return points
+
+
+def test_mark_mask_marks_the_tiles_of_every_cell():
+    rnd = random.Random(7)
+    for width, height, tile_size in ((16, 16, 16), (33, 20, 8), (7, 45, 4), (50, 1, 3)):
+        mask = random_mask(width, height, 30, rnd)
+        by_mask = DirtyTiles(width, height, tile_size)
+        by_cell = DirtyTiles(width, height, tile_size)
+        by_mask.clear()
+        by_cell.clear()
+
+        by_mask.mark_mask(mask)
+        for index in mask.search(1):
+            by_cell.mark_cell(*divmod(index, width))
+
+        assert by_mask.dirty_tiles() == by_cell.dirty_tiles()
+
+
+def test_visibility_is_the_neighbourhood_of_the_territory():
+    rnd = random.Random(11)
+    for width, height in ((10, 10), (13, 6), (1, 9), (9, 1)):
+        mask = random_mask(width, height, 8, rnd)
+        visibility = Visibility(width, height)
+
+        visibility.update(mask)
+
+        # No row wraps around into the next one
+        assert set(visibility.visible_points()) == neighbourhood(mask, width, height)
+
+
+def test_visibility_changes_add_up_until_refreshed():
+    visibility = Visibility(8, 8)
+    first, second = bitarray(64), bitarray(64)
+    first.setall(0)
+    second.setall(0)
+    first[0] = 1
+    second[63] = 1
+    nothing = bitarray(64)
+    nothing.setall(0)
+
+    visibility.update(first)
+    changed = visibility.update(first | second)
+
+    assert set(changed) == neighbourhood(first | second, 8, 8)
+    assert set(visibility.refresh_points(nothing)) == neighbourhood(first | second, 8, 8)
+    assert visibility.refresh_points(nothing) == ()
+
+
+def test_merged_territory_counts_both():
+    king, captured = Territory(6, 6), Territory(6, 6)
+    king.batch_add_points([Point(0, 0), Point(0, 1)])
+    captured.batch_add_points([Point(5, 5), Point(4, 5), Point(3, 5)])
+    king.apply_batch_updates()
+    captured.apply_batch_updates()
+
+    king.merge(captured)
+
+    assert king.count() == 5
+    assert king.count() == king.mask.count()
+    assert set(king.points()) == {Point(0, 0), Point(0, 1), Point(5, 5), Point(4, 5), Point(3, 5)}
@@ -0,0 +1,86 @@
+import orjson
+import pytest
+
+from app_types.map import CellType, MapMeta, Point
+from services.room import chat
+from services.room.game_room import GameRoom
+from services.room.replays import ReplayPlayer
+from settings import settings
+
+
+class ListeningPlayer(ReplayPlayer):
+    def __init__(self, id: int, nick: str, map_size: tuple[int, int]):
+        super().__init__(id, nick, map_size)
+        self.frames: list[dict] = []
+
+    async def send_text(self, text: str) -> None:
+        self.frames.append(orjson.loads(text))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_room() -> GameRoom:
+    game_map = [[{"type": CellType.FIELD} for _ in range(4)] for _ in range(4)]
+    meta = MapMeta(points_of_interest={CellType.SPAWN: [Point(0, 0)]}, version=1)
+    return GameRoom("room", game_map, meta)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(chat.time, "monotonic", clock)
+    monkeypatch.setattr(settings, "chat_burst", 3)
+    monkeypatch.setattr(settings, "chat_rate", 1.0)
+    monkeypatch.setattr(settings, "chat_batch_window", 0)
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_burst_then_the_rate(clock):
+    room = make_room()
+    one, two = ListeningPlayer(1, "one", (4, 4)), ListeningPlayer(2, "two", (4, 4))
+
+    assert [room.chat.post(one, "hi") for _ in range(4)] == [True, True, True, False]
+    # The bucket is per user
+    assert room.chat.post(two, "hi")
+
+    clock.now += 0.5
+    assert not room.chat.post(one, "hi")
+    clock.now += 0.5
+    assert room.chat.post(one, "hi")
+    assert not room.chat.post(one, "hi")
+
+    # Refilled up to the burst only
+    clock.now += 60
+    assert [room.chat.post(one, "hi") for _ in range(4)] == [True, True, True, False]
+    await room.chat._task
+
+
+@pytest.mark.asyncio
+async def test_messages_go_out_in_one_frame(clock):
+    room = make_room()
+    one, two = ListeningPlayer(1, "one", (4, 4)), ListeningPlayer(2, "two", (4, 4))
+    room.players = {one.id: one, two.id: two}
+
+    assert room.chat.post(one, "  hello  ")
+    assert room.chat.post(two, "hey")
+    assert not room.chat.post(two, "   ")
+    await room.chat._task
+
+    for player in (one, two):
+        assert len(player.frames) == 1
+        assert player.frames[0]["at"] == "chats"
+        assert [message["message"] for message in player.frames[0]["messages"]] == [
+            "hello",
+            "hey",
+        ]
+
+    late = ListeningPlayer(3, "three", (4, 4))
+    await room.chat.send_history(late)
+    assert [message["user_id"] for message in late.frames[0]["messages"]] == [1, 2]
@@ -0,0 +1,97 @@
+import asyncio
+import contextlib
+
+import orjson
+import pytest
+from prometheus_client import REGISTRY
+
+from app_types.map import Point
+from exceptions.room import RoomError
+from repositories.event import event_repo
+from services.room import events
+from services.room.events import GameEvents
+from settings import settings
+from stores.redis import redis_manager
+
+
+def dropped(reason: str) -> float:
+    return REGISTRY.get_sample_value("game_events_dropped_total", {"reason": reason}) or 0.0
+
+
+@pytest.fixture
+def events_redis(redis, monkeypatch):
+    @contextlib.asynccontextmanager
+    async def client():
+        yield redis
+
+    monkeypatch.setattr(redis_manager, "client", client)
+    return redis
+
+
+@pytest.mark.asyncio
+async def test_events_reach_the_room_stream_in_order(events_redis):
+    game_events = GameEvents("room")
+    game_events.captures(1, {Point(0, 1): (None, 2), Point(3, 4): (1, 2)})
+    game_events.add("turn", 1, [(2, 5, 10)])
+    game_events.add("finished", 1, {"winner": 2})
+
+    game_events.flush()
+    await asyncio.gather(*events._event_writes)
+
+    entries = await events_redis.xrange(event_repo._make_key("room"))
+    assert [fields["type"] for _, fields in entries] == ["captures", "turn", "finished"]
+    assert orjson.loads(entries[0][1]["data"]) == [[0, 1, 2, 0], [3, 4, 2, 1]]
+    results = await events_redis.xrange(event_repo.results_key)
+    assert [fields["room_key"] for _, fields in results] == ["room"]
+
+
+@pytest.mark.asyncio
+async def test_buffer_keeps_the_latest_events(monkeypatch):
+    monkeypatch.setattr(settings, "event_buffer_size", 3)
+    game_events = GameEvents("room")
+    before = dropped("overflow")
+
+    for turn in range(5):
+        game_events.add("turn", turn, [])
+
+    assert [event["turn"] for event in game_events._pending] == [2, 3, 4]
+    assert dropped("overflow") - before == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_counted(monkeypatch, events_redis):
+    async def publish(*args):
+        raise RoomError("Redis is down")
+
+    monkeypatch.setattr(event_repo, "publish", publish)
+    game_events = GameEvents("room")
+    before = dropped("failed")
+
+    game_events.add("turn", 1, [])
+    game_events.add("turn", 2, [])
+    game_events.flush()
+    await asyncio.gather(*events._event_writes)
+
+    assert dropped("failed") - before == 2
+    assert not game_events._pending
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_the_write_in_flight(monkeypatch, events_redis):
+    async def publish(*args):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(event_repo, "publish", publish)
+    game_events = GameEvents("room")
+    game_events.add("turn", 1, [])
+    game_events.flush()
+    await asyncio.sleep(0)
+    game_events.add("turn", 2, [])
+    write = game_events._task
+
+    game_events.stop()
+    with pytest.raises(asyncio.CancelledError):
+        await write
+
+    assert not game_events._pending
+    assert not events._event_writes
@@ -0,0 +1,95 @@
+import pytest
+
+from repositories.replica import replica_repo
+from repositories.room import lobby_repo, room_repo, sharding_repo
+
+
+async def index_members(redis, free_only: bool = False, max_players: int | None = None):
+    return set(await redis.zrange(lobby_repo._make_index_key(free_only, max_players), 0, -1))
+
+
+@pytest.mark.asyncio
+async def test_add_room_lists_it_in_every_index(redis):
+    await lobby_repo.add_room(redis, 2, "a")
+    await lobby_repo.add_room(redis, 4, "b")
+
+    assert await index_members(redis) == {"a", "b"}
+    assert await index_members(redis, free_only=True) == {"a", "b"}
+    assert await index_members(redis, max_players=2) == {"a"}
+    assert await index_members(redis, free_only=True, max_players=4) == {"b"}
+    assert await redis.smembers(lobby_repo.capacities_key) == {"2", "4"}
+
+
+@pytest.mark.asyncio
+async def test_join_and_leave_keep_free_indexes(redis):
+    await lobby_repo.add_room(redis, 2, "a")
+
+    assert await lobby_repo.join_room(redis, "a")
+    assert await lobby_repo.join_room(redis, "a")
+    assert not await lobby_repo.join_room(redis, "a")
+    assert await index_members(redis, free_only=True) == set()
+    assert await index_members(redis, free_only=True, max_players=2) == set()
+    assert await redis.hget(lobby_repo._make_room_key("a"), "current_players") == "2"
+
+    await lobby_repo.leave_room(redis, "a")
+    assert await index_members(redis, free_only=True) == {"a"}
+    assert await index_members(redis, free_only=True, max_players=2) == {"a"}
+
+    assert await lobby_repo.start_room(redis, "a")
+    assert not await lobby_repo.join_room(redis, "a")
+    await lobby_repo.leave_room(redis, "a")
+    assert await index_members(redis) == set()
+    assert await index_members(redis, max_players=2) == set()
+
+
+@pytest.mark.asyncio
+async def test_pages_skip_no_room_with_tied_scores(redis):
+    room_keys = [f"room{i}" for i in range(7)]
+    for room_key in room_keys:
+        await lobby_repo.add_room(redis, 2, room_key)
+    # Rooms created within the same clock tick share their score
+    await redis.zadd(lobby_repo._make_index_key(), {room_key: 1000 for room_key in room_keys})
+
+    listed, cursor = [], None
+    while True:
+        page = await lobby_repo.get_rooms(redis, cursor=cursor, limit=3)
+        listed += [room["name"] for room in page["rooms"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        # A room of the page just read leaving must not shift the next page
+        await redis.zrem(lobby_repo._make_index_key(), cursor.partition(":")[2])
+
+    assert sorted(listed) == room_keys
+    assert len(listed) == len(set(listed))
+
+
+@pytest.mark.asyncio
+async def test_sweep_releases_rooms_of_dead_replicas(redis):
+    for i in range(25):
+        await lobby_repo.add_room(redis, 2 + i % 3, f"room{i}")
+    # Lobby data lost
+    await redis.delete(lobby_repo._make_room_key("room0"))
+    # Owned by a replica without a lease, with and without room data
+    for room_key in ("room1", "room2"):
+        await redis.set(sharding_repo._make_key(room_key), "dead")
+    await redis.set(room_repo._make_key("room2"), b"x")
+    await lobby_repo.join_room(redis, "room2")
+    # Owned by a live replica
+    await redis.set(sharding_repo._make_key("room3"), "alive")
+    await redis.set(f"{replica_repo.lease_prefix}alive", "1")
+
+    swept = await sharding_repo.sweep_orphans(redis, batch_size=4)
+
+    assert sorted(swept) == ["room1", "room2"]
+    for free_only in (False, True):
+        for max_players in (None, 2, 3, 4):
+            members = await index_members(redis, free_only, max_players)
+            assert "room0" not in members
+            assert "room1" not in members
+    assert await redis.exists(lobby_repo._make_room_key("room1")) == 0
+    assert await index_members(redis, free_only=True, max_players=4) >= {"room2"}
+    assert await redis.hget(lobby_repo._make_room_key("room2"), "current_players") == "0"
+    assert await redis.get(sharding_repo._make_key("room2")) is None
+    assert await redis.get(sharding_repo._make_key("room3")) == "alive"
+    assert len(await index_members(redis)) == 23
@@ -0,0 +1,76 @@
+from app_types.map import CellType, GameMap, MapAndMeta, MapMeta, Point
+from repositories.room import decode_room, encode_room
+from services.room.map_templates import MapTemplate, MapTemplateCache
+
+
+def make_raw_room(height: int, width: int, version: int = 1) -> bytes:
+    game_map: GameMap = [[{"type": CellType.FIELD} for _ in range(width)] for _ in range(height)]
+    game_map[0][0] = {"type": CellType.SPAWN}
+    game_map[1][1] = {"type": CellType.CASTLE, "power": 12}
+    meta = MapMeta(points_of_interest={CellType.SPAWN: [Point(0, 0)]}, version=version)
+    return encode_room(MapAndMeta(map=game_map, meta=meta))
+
+
+class CountingParser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, raw_data: bytes) -> MapAndMeta:
+        self.calls += 1
+        return decode_room(raw_data)
+
+
+def test_hit_skips_parsing_and_copies_cells():
+    cache = MapTemplateCache(max_bytes=10 * 1024 * 1024)
+    parse = CountingParser()
+    raw_data = make_raw_room(10, 10)
+
+    first = cache.get_or_parse(raw_data, parse)
+    first["map"][1][1]["power"] = 99
+    first["map"][1][1]["player"] = 1
+    first["meta"]["points_of_interest"][CellType.SPAWN].pop()
+    second = cache.get_or_parse(raw_data, parse)
+
+    assert parse.calls == 1
+    assert second == decode_room(raw_data)
+    assert second["map"][1][1] is not first["map"][1][1]
+
+
+def test_size_is_the_parsed_size():
+    raw_data = make_raw_room(60, 60)
+    template = MapTemplate(decode_room(raw_data))
+
+    # Thousands of cell dicts, far more than the compressed blob they came from
+    assert template.size > 100 * len(raw_data)
+
+
+def test_least_recently_used_is_evicted():
+    raw_rooms = [make_raw_room(20, 20, version) for version in range(3)]
+    template_size = MapTemplate(decode_room(raw_rooms[0])).size
+    cache = MapTemplateCache(max_bytes=2 * template_size)
+    parse = CountingParser()
+
+    cache.get_or_parse(raw_rooms[0], parse)
+    cache.get_or_parse(raw_rooms[1], parse)
+    cache.get_or_parse(raw_rooms[0], parse)
+    cache.get_or_parse(raw_rooms[2], parse)
+    assert len(cache) == 2
+    assert cache.size == 2 * template_size
+
+    cache.get_or_parse(raw_rooms[0], parse)
+    assert parse.calls == 3
+    cache.get_or_parse(raw_rooms[1], parse)
+    assert parse.calls == 4
+
+
+def test_template_over_the_limit_is_not_kept():
+    raw_data = make_raw_room(20, 20)
+    cache = MapTemplateCache(max_bytes=MapTemplate(decode_room(raw_data)).size - 1)
+    parse = CountingParser()
+
+    cache.get_or_parse(raw_data, parse)
+    cache.get_or_parse(raw_data, parse)
+
+    assert parse.calls == 2
+    assert len(cache) == 0
+    assert cache.size == 0
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from app_types.common import PlayerStatus
+from app_types.map import CellType, GameMap, MapAndMeta, MapMeta, Point
+from app_types.room import SnapshotPlayer
+from repositories.room import (
+    ROOM_FLAG_COMPRESSED,
+    ROOM_FORMAT_MAGIC,
+    decode_room,
+    decode_snapshot,
+    encode_room,
+    encode_snapshot_meta,
+    encode_snapshot_tile,
+)
+
+
+def make_room(height: int, width: int) -> MapAndMeta:
+    game_map: GameMap = [[{} for _ in range(width)] for _ in range(height)]
+    game_map[0][0] = {"type": CellType.SPAWN}
+    game_map[0][1] = {"type": CellType.KING, "player": 1, "power": 12}
+    game_map[1][0] = {"type": CellType.FIELD, "player": 2, "power": 3}
+    game_map[1][1] = {"type": CellType.CASTLE, "power": 40}
+    game_map[height - 1][width - 1] = {"type": CellType.BLOCKER}
+    meta = MapMeta(
+        points_of_interest={
+            CellType.SPAWN: [Point(0, 0), Point(height - 1, 0)],
+            CellType.CASTLE: [Point(1, 1)],
+        },
+        version=1,
+    )
+    return MapAndMeta(map=game_map, meta=meta)
+
+
+def test_small_room_round_trip():
+    room = make_room(4, 5)
+    raw_data = encode_room(room)
+
+    assert raw_data.startswith(ROOM_FORMAT_MAGIC)
+    assert not raw_data[len(ROOM_FORMAT_MAGIC) + 1] & ROOM_FLAG_COMPRESSED
+    assert decode_room(raw_data) == room
+
+
+def test_large_room_is_compressed():
+    room = make_room(60, 60)
+    raw_data = encode_room(room)
+
+    assert raw_data[len(ROOM_FORMAT_MAGIC) + 1] & ROOM_FLAG_COMPRESSED
+    decoded = decode_room(raw_data)
+    assert decoded == room
+    assert decoded["meta"]["points_of_interest"][CellType.SPAWN] == [Point(0, 0), Point(59, 0)]
+
+
+def test_legacy_json_room():
+    raw_data = json.dumps(
+        {
+            "map": [[{"type": "spawn"}, {"type": "field", "power": 2}], [{}, {"type": "block"}]],
+            "meta": {
+                "points_of_interest": {"spawn": [{"row": 0, "col": 0, "type": "Point"}]},
+                "version": 1,
+            },
+        }
+    ).encode()
+
+    room = decode_room(raw_data)
+
+    assert room["map"] == [
+        [{"type": CellType.SPAWN}, {"type": CellType.FIELD, "power": 2}],
+        [{}, {"type": CellType.BLOCKER}],
+    ]
+    assert room["meta"]["points_of_interest"] == {"spawn": [Point(0, 0)]}
+
+
+def test_unknown_format_version():
+    raw_data = encode_room(make_room(2, 2))
+    raw_data = ROOM_FORMAT_MAGIC + bytes((99,)) + raw_data[len(ROOM_FORMAT_MAGIC) + 1 :]
+
+    with pytest.raises(ValueError):
+        decode_room(raw_data)
+
+
+def test_snapshot_tiles_round_trip():
+    room = make_room(5, 7)
+    players = [
+        SnapshotPlayer(
+            id=1, nick="one", color=0, status=PlayerStatus.READY, init_point=Point(0, 1)
+        ),
+        SnapshotPlayer(
+            id=2, nick="two", color=3, status=PlayerStatus.LOSER, init_point=Point(1, 0)
+        ),
+    ]
+    meta_data = encode_snapshot_meta(42, room["meta"], players)
+    tiles = [
+        encode_snapshot_tile(room["map"], bounds).decode()
+        for bounds in ((0, 0, 4, 4), (0, 4, 4, 7), (4, 0, 5, 4), (4, 4, 5, 7))
+    ]
+
+    snapshot = decode_snapshot(5, 7, meta_data.decode(), tiles)
+
+    assert snapshot["turn"] == 42
+    assert snapshot["map"] == room["map"]
+    assert snapshot["meta"] == room["meta"]
+    assert snapshot["players"] == players
@@ -0,0 +1,62 @@
+import pytest
+
+from app_types.map import CellType, MapMeta, Point, Viewport
+from services.room.game_room import GameRoom
+from services.room.replays import ReplayPlayer
+from settings import settings
+
+
+def make_room(height: int, width: int) -> GameRoom:
+    game_map = [[{"type": CellType.FIELD} for _ in range(width)] for _ in range(height)]
+    meta = MapMeta(points_of_interest={CellType.SPAWN: [Point(0, 0)]}, version=1)
+    return GameRoom("room", game_map, meta)
+
+
+def test_viewport_is_clamped_to_the_map(monkeypatch):
+    monkeypatch.setattr(settings, "viewport_margin", 2)
+    monkeypatch.setattr(settings, "viewport_max_size", 10)
+    player = ReplayPlayer(1, "one", (30, 40))
+
+    player.set_viewport(10, 10, 5, 6)
+    assert player.viewport == Viewport(8, 8, 9, 10)
+
+    player.set_viewport(-5, -5, 1000, 1000)
+    assert player.viewport == Viewport(0, 0, 12, 12)
+
+    # Scrolled past the bottom right corner
+    player.set_viewport(100, 100, 5, 5)
+    assert player.viewport == Viewport(27, 37, 3, 3)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"at": "viewport"},
+        {"at": "viewport", "row": "1", "col": 0, "height": 5, "width": 5},
+        {"at": "viewport", "row": 1, "col": 0, "height": 5.5, "width": 5},
+        {"at": "viewport", "row": 1, "col": 0, "height": 0, "width": 5},
+        {"at": "viewport", "row": 1, "col": 0, "height": 5, "width": -1},
+        {"at": "viewport", "row": None, "col": 0, "height": 5, "width": 5},
+    ],
+)
+async def test_malformed_viewport_is_ignored(message):
+    room = make_room(10, 10)
+    player = ReplayPlayer(1, "one", (10, 10))
+
+    await room.handle_player_message(player, message)
+
+    assert player.viewport is None
+
+
+@pytest.mark.asyncio
+async def test_viewport_message_sets_the_viewport(monkeypatch):
+    monkeypatch.setattr(settings, "viewport_margin", 2)
+    room = make_room(10, 10)
+    player = ReplayPlayer(1, "one", (10, 10))
+
+    await room.handle_player_message(
+        player, {"at": "viewport", "row": 2, "col": 3, "height": 4, "width": 5}
+    )
+
+    assert player.viewport == Viewport(0, 1, 8, 9)
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+import orjson
+
+from logger import get_logger
+from settings import settings
+
+logger = get_logger(__name__)
+
+SpanRecord = tuple[str, int, int, dict[str, Any] | None]
+
+
+class TurnTrace:
+    """Spans and counters of one game turn, times are Unix nanoseconds"""
+
+    __slots__ = ("turn", "start", "end", "spans", "counts")
+
+    def __init__(self, turn: int):
+        self.turn = turn
+        self.start = time.time_ns()
+        self.end = 0
+        self.spans: list[SpanRecord] = []
+        self.counts: dict[str, int] = {}
+
+
+# Set by the game loop for the duration of a turn, tasks started within the turn see it too
+current_trace: ContextVar[TurnTrace | None] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def trace_span(name: str, **attributes: Any) -> Iterator[None]:
+    """Record a span in the current turn trace, a no-op outside of turns"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.time_ns()
+    try:
+        yield
+    finally:
+        trace.spans.append((name, start, time.time_ns(), attributes or None))
+
+
+def trace_count(name: str, value: int = 1) -> None:
+    trace = current_trace.get()
+    if trace is not None:
+        trace.counts[name] = trace.counts.get(name, 0) + value
+
+
+class FlightRecorder:
+    """Ring buffer of the last turn traces of a room.
+
+    It is dumped to a file when a turn overruns its budget or fails, at most once per
+    cooldown. Dumps use the OTLP/JSON trace format, one export request per line as the
+    OpenTelemetry collector file exporter writes it, so they load into any OTLP tool.
+    """
+
+    def __init__(self, room_key: str, size: int, cooldown: float):
+        self._room_key = room_key
+        self._cooldown = cooldown
+        self._traces: deque[TurnTrace] = deque(maxlen=size)
+        self._last_dump = float("-inf")
+        self._task: asyncio.Task | None = None
+
+    @contextmanager
+    def turn(self, number: int) -> Iterator[TurnTrace]:
+        trace = TurnTrace(number)
+        token = current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            trace.end = time.time_ns()
+            current_trace.reset(token)
+            self._traces.append(trace)
+
+    def dump(self, reason: str) -> None:
+        now = time.monotonic()
+        if not self._traces or now - self._last_dump < self._cooldown:
+            return
+
+        self._last_dump = now
+        last_turn = self._traces[-1].turn
+        path = os.path.join(
+            settings.flight_recorder_dir, f"{self._room_key}-{last_turn}-{reason}.otlp.json"
+        )
+        logger.warning(
+            "Flight recorder dump",
+            extra={"room_key": self._room_key, "reason": reason, "path": path},
+        )
+        self._task = asyncio.create_task(asyncio.to_thread(self._write, path, self.export()))
+
+    def export(self) -> bytes:
+        """Encode the buffered turns as an OTLP/JSON ExportTraceServiceRequest"""
+        spans = []
+        for trace in self._traces:
+            trace_id = secrets.token_hex(16)
+            root_id = secrets.token_hex(8)
+            attributes = {"room.key": self._room_key, "game.turn": trace.turn, **trace.counts}
+            spans.append(
+                _otlp_span(trace_id, root_id, None, "turn", trace.start, trace.end, attributes)
+            )
+            for name, start, end, span_attributes in trace.spans:
+                spans.append(
+                    _otlp_span(
+                        trace_id, secrets.token_hex(8), root_id, name, start, end, span_attributes
+                    )
+                )
+
+        resource = {"service.name": "rooms", "service.instance.id": settings.replica_id}
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes(resource)},
+                    "scopeSpans": [{"scope": {"name": "rooms.game_loop"}, "spans": spans}],
+                }
+            ]
+        }
+        return orjson.dumps(request) + b"\n"
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(data)
+        except OSError as e:
+            logger.error("Flight recorder dump failed", extra={"path": path}, exc_info=e)
+
+
+def _otlp_span(
+    trace_id: str,
+    span_id: str,
+    parent_id: str | None,
+    name: str,
+    start: int,
+    end: int,
+    attributes: dict[str, Any] | None,
+) -> dict[str, Any]:
+    otlp_span = {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "name": name,
+        "kind": 1,
+        "startTimeUnixNano": str(start),
+        "endTimeUnixNano": str(end),
+        "attributes": _otlp_attributes(attributes or {}),
+    }
+    if parent_id:
+        otlp_span["parentSpanId"] = parent_id
+    return otlp_span
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [
+        {
+            "key": key,
+            "value": {"intValue": str(value)}
+            if isinstance(value, int)
+            else {"stringValue": str(value)},
+        }
+        for key, value in attributes.items()
+    ]
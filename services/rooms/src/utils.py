@@ -1,10 +1,11 @@
 import time
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 
 from prometheus_client import Histogram
 from sqids import Sqids
 
 from settings import settings
+from tracing import trace_span
 
 
 def make_room_key(pk: int) -> str:
@@ -13,11 +14,13 @@ def make_room_key(pk: int) -> str:
 
 
 @contextmanager
-def measure_time(histogram: Histogram, labels: dict):
-    """Context manager for measuring execution time"""
+def measure_time(histogram: Histogram, labels: dict | None = None, span: str | None = None):
+    """Context manager for measuring execution time, pass no labels for a bound child.
+    With a span name the time is also recorded in the trace of the current turn"""
     start = time.perf_counter()
     try:
-        yield
+        with trace_span(span) if span else nullcontext():
+            yield
     finally:
         duration = time.perf_counter() - start
-        histogram.labels(**labels).observe(duration)
+        (histogram.labels(**labels) if labels else histogram).observe(duration)